@@ -0,0 +1,151 @@
+"""
+Micro-benchmark for the prompt classifier
+
+Times the old linear substring scans (the original English table, and the
+same approach over the full bilingual keyword file) against the compiled
+keyword automaton, with and without the memo cache, over a mix of English and
+Spanish prompts.
+Also checks that English prompts still land in the same category as before
+and exits with status 1 if any don't.
+
+    python -m benchmarks.classifier --prompts 5000 --repeat 5
+"""
+import sys
+import time
+import random
+import json
+import argparse
+
+from services.prompt_classifier import PromptClassifier, normalize
+
+# The hard-coded tables MusicService used before the keyword file
+LEGACY_MUSIC_TABLE = [
+    ("gym", ["gym", "workout", "exercise", "fitness", "training"]),
+    ("luxury", ["luxury", "miami", "beach", "lifestyle"]),
+    ("tutorial", ["tutorial", "how to", "guide", "learn", "explain"]),
+    ("comedy", ["funny", "comedy", "joke", "fun"]),
+    ("inspirational", ["inspire", "motivation", "success", "dream"]),
+]
+
+ENGLISH_PROMPTS = [
+    "A person doing a heavy squat workout at a modern gym",
+    "Sunset walk on a Miami beach with a luxury sports car",
+    "How to cook a perfect omelette in five minutes",
+    "A funny cat knocking things off a kitchen table",
+    "Morning routine of a successful entrepreneur chasing a dream",
+    "Drone shot of a quiet mountain lake in autumn",
+    "Step by step guide to editing short videos on a phone",
+    "Close-up of coffee being poured in slow motion",
+]
+
+SPANISH_PROMPTS = [
+    "Rutina para pecho en el gimnasio con mancuernas",
+    "Un día de lujo en la playa de Miami",
+    "Cómo hacer pan casero paso a paso",
+    "Un chiste divertido entre amigos en la oficina",
+    "Historia de superación y motivación personal",
+    "Paisaje de montaña al amanecer con niebla",
+]
+
+
+def legacy_classify(prompt: str) -> str:
+    prompt_lower = prompt.lower()
+    for category, words in LEGACY_MUSIC_TABLE:
+        if any(word in prompt_lower for word in words):
+            return category
+    return "default"
+
+
+def linear_scan(classifier: PromptClassifier):
+    # The legacy approach applied to the full bilingual table
+    music = classifier.tables["music"]
+    table = [(category, []) for category in music["categories"]]
+    for keyword, priority in keyword_priorities(classifier.path):
+        table[priority][1].append(keyword)
+
+    def classify(prompt: str) -> str:
+        prompt_lower = normalize(prompt)
+        for category, words in table:
+            if any(word in prompt_lower for word in words):
+                return category
+        return music["default"]
+
+    return classify
+
+
+def keyword_priorities(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        categories = json.load(f)["music"]["categories"]
+    return [
+        (normalize(keyword), priority)
+        for priority, category in enumerate(categories)
+        for keyword in category["keywords"]
+    ]
+
+
+def make_prompts(count: int) -> list:
+    # Unique suffixes so the cold runs really miss the memo cache
+    base = ENGLISH_PROMPTS + SPANISH_PROMPTS
+    return [f"{random.choice(base)} #{i}" for i in range(count)]
+
+
+def timed(fn, prompts: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for prompt in prompts:
+            fn(prompt)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prompt classifier")
+    parser.add_argument("--prompts", type=int, default=5000, help="Distinct prompts per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.prompts)
+
+    mismatches = [
+        prompt for prompt in ENGLISH_PROMPTS
+        if PromptClassifier().classify("music", prompt) != legacy_classify(prompt)
+    ]
+
+    def cold(prompt):
+        # A fresh cache per call, but the automaton is compiled once up front
+        classifier._cache.clear()
+        return classifier.classify("music", prompt)
+
+    classifier = PromptClassifier()
+    classifier.tables
+
+    memoized = PromptClassifier()
+    memoized.cache_size = len(prompts)
+    for prompt in prompts:
+        memoized.classify("music", prompt)
+
+    results = {
+        "legacy scan": timed(legacy_classify, prompts, args.repeat),
+        "full-table scan": timed(linear_scan(classifier), prompts, args.repeat),
+        "automaton": timed(cold, prompts, args.repeat),
+        "automaton + memo": timed(lambda p: memoized.classify("music", p), prompts, args.repeat),
+    }
+
+    print(f"{'variant':<20}{'total ms':>10}{'us/prompt':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<20}{seconds * 1000:>10.2f}{seconds / len(prompts) * 1e6:>12.2f}")
+
+    print()
+    for prompt in SPANISH_PROMPTS:
+        print(f"{classifier.classify('music', prompt):<15}{prompt}")
+
+    if mismatches:
+        print("\nEnglish prompts classified differently than before:")
+        for prompt in mismatches:
+            print(f"  {prompt}: {PromptClassifier().classify('music', prompt)} (was {legacy_classify(prompt)})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Local stand-ins for the Sora (OpenAI), ElevenLabs and Suno APIs
+
+Serves just enough of each API for the video pipeline and suggestions to run
+end to end, with configurable latency, failure rate and payload sizes.
+
+    python -m benchmarks.fake_providers --port 8100 --latency 0.05 --failure-rate 0.02
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+
+FAKE_SUGGESTIONS = "\n\n".join(
+    f"""Title: Benchmark idea {i}
+Description: A person training at a bright modern gym, idea number {i}
+Duration: 30 seconds
+Platforms: TikTok, Instagram Reels, YouTube Shorts
+Hashtags: #gym, #fitness, #workout, #motivation, #benchmark
+Hook: Close-up of a barbell hitting the floor"""
+    for i in range(1, 6)
+)
+
+
+class FakeProviderConfig:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        latency_jitter: float = 0.02,
+        failure_rate: float = 0.0,
+        render_seconds: float = 2.0,
+        render_failure_rate: float = 0.0,
+        music_seconds: float = 1.0,
+        video_bytes: int = 5 * 1024 ** 2,
+        audio_bytes: int = 512 * 1024,
+        token_delay: float = 0.005
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.render_seconds = render_seconds
+        self.render_failure_rate = render_failure_rate
+        self.music_seconds = music_seconds
+        self.video_bytes = video_bytes
+        self.audio_bytes = audio_bytes
+        self.token_delay = token_delay
+
+
+def create_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI(title="RELAI fake providers")
+    videos = {}
+    songs = {}
+    stats = {"requests": 0, "injected_failures": 0}
+    payloads = {}
+
+    def payload(size: int) -> bytes:
+        # Random bytes once per size, so serving them costs no CPU per request
+        if size not in payloads:
+            payloads[size] = os.urandom(size)
+        return payloads[size]
+
+    def content_url(request: Request, name: str) -> str:
+        return str(request.base_url) + f"content/{name}"
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        stats["requests"] += 1
+        delay = config.latency + random.uniform(-config.latency_jitter, config.latency_jitter)
+        await asyncio.sleep(max(0.0, delay))
+
+        is_api = not request.url.path.startswith(("/content/", "/health", "/stats"))
+        if is_api and random.random() < config.failure_rate:
+            stats["injected_failures"] += 1
+            return JSONResponse(
+                status_code=503,
+                content={"error": {"message": "Injected failure", "type": "server_error"}}
+            )
+        return await call_next(request)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, "videos": len(videos), "songs": len(songs)}
+
+    # OpenAI: files, Sora videos, chat completions
+
+    @app.post("/openai/v1/files")
+    async def create_file(request: Request):
+        body = await request.body()
+        return {
+            "id": f"file-{uuid.uuid4().hex[:24]}",
+            "object": "file",
+            "bytes": len(body),
+            "created_at": int(time.time()),
+            "filename": "upload",
+            "purpose": "user_data",
+            "status": "processed",
+        }
+
+    @app.post("/openai/v1/videos")
+    async def create_video(request: Request):
+        video_id = f"video_{uuid.uuid4().hex[:24]}"
+        videos[video_id] = {
+            "created_at": time.time(),
+            "failed": random.random() < config.render_failure_rate,
+        }
+        return {"id": video_id, "object": "video", "status": "queued"}
+
+    @app.get("/openai/v1/videos/{video_id}")
+    async def retrieve_video(video_id: str, request: Request):
+        video = videos.get(video_id)
+        if video is None:
+            return JSONResponse(status_code=404, content={"error": {"message": "No such video"}})
+
+        result = {"id": video_id, "object": "video", "status": "in_progress"}
+        if time.time() - video["created_at"] >= config.render_seconds:
+            if video["failed"]:
+                result["status"] = "failed"
+            else:
+                result["status"] = "completed"
+                result["output"] = {"url": content_url(request, f"{video_id}.mp4")}
+        return result
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": FAKE_SUGGESTIONS},
+                }],
+            }
+
+        async def stream():
+            words = FAKE_SUGGESTIONS.split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": None,
+                        "delta": {"content": word if i == 0 else " " + word},
+                    }],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(config.token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # ElevenLabs: text to speech and voice library
+
+    @app.post("/elevenlabs/v1/text-to-speech/{voice_id}")
+    @app.post("/elevenlabs/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech(voice_id: str):
+        audio = payload(config.audio_bytes)
+
+        async def stream():
+            for start in range(0, len(audio), CHUNK_SIZE):
+                yield audio[start:start + CHUNK_SIZE]
+
+        return StreamingResponse(stream(), media_type="audio/mpeg")
+
+    @app.post("/elevenlabs/v1/voices/add")
+    async def add_voice(request: Request):
+        await request.body()
+        return {"voice_id": uuid.uuid4().hex[:20]}
+
+    @app.delete("/elevenlabs/v1/voices/{voice_id}")
+    async def delete_voice(voice_id: str):
+        return {"status": "ok"}
+
+    @app.get("/elevenlabs/v1/voices")
+    async def list_voices():
+        return {"voices": []}
+
+    # Suno: music generation
+
+    @app.post("/suno/v1/generate")
+    async def generate_music():
+        song_id = uuid.uuid4().hex
+        songs[song_id] = time.time()
+        return {"id": song_id, "status": "processing"}
+
+    @app.get("/suno/v1/generate/{song_id}")
+    async def music_status(song_id: str, request: Request):
+        created_at = songs.get(song_id)
+        if created_at is None:
+            return JSONResponse(status_code=404, content={"error": "No such generation"})
+        if time.time() - created_at < config.music_seconds:
+            return {"id": song_id, "status": "processing"}
+        return {"id": song_id, "status": "completed", "audio_url": content_url(request, f"{song_id}.mp3")}
+
+    # Rendered media, with Range support so resumed downloads work
+
+    @app.get("/content/{name}")
+    async def content(name: str, request: Request):
+        media_type = "video/mp4" if name.endswith(".mp4") else "audio/mpeg"
+        data = payload(config.video_bytes if name.endswith(".mp4") else config.audio_bytes)
+        start, status_code, headers = 0, 200, {"Accept-Ranges": "bytes"}
+
+        range_header = request.headers.get("range", "")
+        if range_header.startswith("bytes="):
+            start = int(range_header[len("bytes="):].split("-")[0] or 0)
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+
+        async def stream():
+            for offset in range(start, len(data), CHUNK_SIZE):
+                yield data[offset:offset + CHUNK_SIZE]
+
+        headers["Content-Length"] = str(len(data) - start)
+        return StreamingResponse(stream(), status_code=status_code, headers=headers, media_type=media_type)
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.05, help="Base response latency (s)")
+    parser.add_argument("--latency-jitter", type=float, default=0.02, help="Uniform +/- jitter (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of API calls answered with 503")
+    parser.add_argument("--render-seconds", type=float, default=2.0, help="Sora render time (s)")
+    parser.add_argument("--render-failure-rate", type=float, default=0.0, help="Share of renders that fail")
+    parser.add_argument("--music-seconds", type=float, default=1.0, help="Suno generation time (s)")
+    parser.add_argument("--video-bytes", type=int, default=5 * 1024 ** 2, help="Rendered video size")
+    parser.add_argument("--audio-bytes", type=int, default=512 * 1024, help="TTS and music file size")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Delay between streamed tokens (s)")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeProviderConfig:
+    return FakeProviderConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        failure_rate=args.failure_rate,
+        render_seconds=args.render_seconds,
+        render_failure_rate=args.render_failure_rate,
+        music_seconds=args.music_seconds,
+        video_bytes=args.video_bytes,
+        audio_bytes=args.audio_bytes,
+        token_delay=args.token_delay
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Sora, ElevenLabs and Suno servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Event-loop lag check for the file-I/O paths
+
+Runs the disk-heavy operations the services perform (streamed writes, hashed
+writes, ranged reads, cache stores) concurrently while a probe measures how
+late the event loop gets to run. Exits with status 1 if any scenario blocks
+the loop for longer than --max-lag.
+
+    python -m benchmarks.loop_lag --streams 16 --mb 32
+    python -m benchmarks.loop_lag --blocking-reference   # also show a synchronous baseline
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+from services.file_io import file_io
+from services.tts_cache import TTSCache
+
+CHUNK_SIZE = 64 * 1024
+
+
+class LagProbe:
+    """
+    Wakes up every `interval` seconds and records how late each wakeup was
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self._task = None
+
+    async def __aenter__(self) -> "LagProbe":
+        self._task = asyncio.create_task(self._run())
+        # Let the probe take its first sample before the workload starts
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+
+
+async def chunks(data: bytes):
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield data[start:start + CHUNK_SIZE]
+
+
+async def streamed_writes(workdir: Path, data: bytes, streams: int):
+    async def write(i: int):
+        async with file_io.open_writer(workdir / f"stream_{i}.bin") as f:
+            async for chunk in chunks(data):
+                await f.write(chunk)
+
+    await asyncio.gather(*[write(i) for i in range(streams)])
+
+
+async def hashed_writes(workdir: Path, data: bytes, streams: int):
+    async def write(i: int):
+        digest = hashlib.sha256()
+        async with file_io.open_writer(workdir / f"hashed_{i}.bin", digest=digest) as f:
+            async for chunk in chunks(data):
+                await f.write(chunk)
+
+    await asyncio.gather(*[write(i) for i in range(streams)])
+
+
+async def ranged_reads(workdir: Path, data: bytes, streams: int):
+    async def read(i: int):
+        async for _ in file_io.read_chunks(workdir / f"stream_{i}.bin", 0, len(data) - 1):
+            pass
+
+    await asyncio.gather(*[read(i) for i in range(streams)])
+
+
+async def tts_cache_stores(workdir: Path, data: bytes, streams: int):
+    cache = TTSCache(workdir / "tts")
+    await asyncio.gather(*[
+        cache.put_stream(hashlib.sha256(str(i).encode()).hexdigest(), chunks(data))
+        for i in range(streams)
+    ])
+
+
+async def blocking_writes(workdir: Path, data: bytes, streams: int):
+    # What the services used to do: synchronous writes straight from the event loop
+    for i in range(streams):
+        with open(workdir / f"blocking_{i}.bin", "wb") as f:
+            for start in range(0, len(data), CHUNK_SIZE):
+                f.write(data[start:start + CHUNK_SIZE])
+            f.flush()
+            os.fsync(f.fileno())
+        await asyncio.sleep(0)
+
+
+SCENARIOS = {
+    "streamed_writes": streamed_writes,
+    "hashed_writes": hashed_writes,
+    "ranged_reads": ranged_reads,
+    "tts_cache_stores": tts_cache_stores,
+}
+
+
+async def run(args: argparse.Namespace) -> bool:
+    workdir = Path(tempfile.mkdtemp(prefix="relai-loop-lag-"))
+    data = os.urandom(args.mb * 1024 * 1024)
+    scenarios = dict(SCENARIOS)
+    if args.blocking_reference:
+        scenarios["blocking_reference"] = blocking_writes
+
+    passed = True
+    print(f"{'scenario':<20}{'seconds':>10}{'max lag ms':>12}{'total lag ms':>14}")
+    try:
+        for name, scenario in scenarios.items():
+            started = time.perf_counter()
+            async with LagProbe() as probe:
+                await scenario(workdir, data, args.streams)
+            elapsed = time.perf_counter() - started
+
+            # The reference scenario is expected to block; it is never gated
+            failed = name != "blocking_reference" and probe.max_lag > args.max_lag
+            passed = passed and not failed
+            print(f"{name:<20}{elapsed:>10.2f}{probe.max_lag * 1000:>12.1f}{probe.total_lag * 1000:>14.1f}"
+                  + ("  FAIL" if failed else ""))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        file_io.shutdown()
+
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that file I/O doesn't block the event loop")
+    parser.add_argument("--streams", type=int, default=16, help="Concurrent files per scenario")
+    parser.add_argument("--mb", type=int, default=16, help="Size of each file in MB")
+    parser.add_argument("--max-lag", type=float, default=0.05, help="Allowed event-loop lag (s)")
+    parser.add_argument("--blocking-reference", action="store_true",
+                        help="Also run synchronous writes on the loop for comparison")
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
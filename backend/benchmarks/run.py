@@ -0,0 +1,377 @@
+"""
+Offline load test for the video pipeline
+
+Starts the fake providers and the API (each in its own process), drives
+concurrent upload -> generate -> status -> download workloads against it and
+reports latency percentiles, throughput, peak RSS and event-loop lag.
+
+    python -m benchmarks.run --jobs 40 --concurrency 8
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.2
+
+With --baseline the exit status is 1 when a metric regressed beyond the tolerance.
+"""
+import io
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Optional, List
+
+import httpx
+from PIL import Image
+
+from benchmarks import fake_providers
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Latency phases compared against the baseline (higher is worse)
+GATED_LATENCIES = ("upload", "generate", "end_to_end", "download")
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """
+    Linear-interpolated percentile, p in [0, 100]
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else None,
+        "max": max(values) if values else None,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """
+    High-water mark of the process's resident memory (Linux only)
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def parse_metrics(text: str) -> dict:
+    """
+    Unlabelled samples from a Prometheus text exposition
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#") or "{" in line:
+            continue
+        parts = line.split()
+        if len(parts) == 2:
+            samples[parts[0]] = float(parts[1])
+    return samples
+
+
+def test_image() -> bytes:
+    image = Image.new("RGB", (1024, 1024), (200, 120, 80))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise Exception(f"{url} did not come up within {timeout:.0f}s")
+
+
+class LoadTest:
+    def __init__(self, api_url: str, jobs: int, concurrency: int, duration: int, poll_interval: float):
+        self.api_url = api_url
+        self.jobs = jobs
+        self.concurrency = concurrency
+        self.duration = duration
+        self.poll_interval = poll_interval
+        self.latencies = {phase: [] for phase in GATED_LATENCIES + ("status",)}
+        self.completed = 0
+        self.failed = 0
+        self.errors = []
+        self._next_job = 0
+
+    async def run(self) -> float:
+        image = test_image()
+        limits = httpx.Limits(max_connections=self.concurrency * 2)
+        async with httpx.AsyncClient(base_url=self.api_url, timeout=600, limits=limits) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*[self._user(client, image) for _ in range(self.concurrency)])
+            return time.perf_counter() - started
+
+    async def _user(self, client: httpx.AsyncClient, image: bytes):
+        while self._next_job < self.jobs:
+            self._next_job += 1
+            try:
+                await self._job(client, image)
+            except Exception as e:
+                self.failed += 1
+                self.errors.append(str(e))
+
+    async def _job(self, client: httpx.AsyncClient, image: bytes):
+        job_started = time.perf_counter()
+
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/upload/image",
+            files={"file": ("benchmark.jpg", image, "image/jpeg")}
+        )
+        response.raise_for_status()
+        self.latencies["upload"].append(time.perf_counter() - started)
+        file_id = response.json()["file_id"]
+
+        started = time.perf_counter()
+        response = await client.post("/api/video/generate", json={
+            "user_image_id": file_id,
+            "prompt": "Chest workout at a luxury gym, five exercises, black athletic gear",
+            "voice_type": "ai",
+            "duration": self.duration,
+        })
+        response.raise_for_status()
+        self.latencies["generate"].append(time.perf_counter() - started)
+        video_id = response.json()["video_id"]
+
+        while True:
+            started = time.perf_counter()
+            response = await client.get(f"/api/video/status/{video_id}")
+            response.raise_for_status()
+            self.latencies["status"].append(time.perf_counter() - started)
+            status = response.json()
+            if status["status"] == "completed":
+                break
+            if status["status"] == "failed":
+                raise Exception(f"Job failed: {status.get('error')}")
+            await asyncio.sleep(self.poll_interval)
+
+        started = time.perf_counter()
+        async with client.stream("GET", f"/api/video/download/{video_id}") as response:
+            response.raise_for_status()
+            async for _ in response.aiter_bytes():
+                pass
+        self.latencies["download"].append(time.perf_counter() - started)
+
+        self.latencies["end_to_end"].append(time.perf_counter() - job_started)
+        self.completed += 1
+
+
+def check_regressions(report: dict, baseline: dict, tolerance: float, max_loop_lag: float) -> List[str]:
+    """
+    Compare a report with a saved baseline; returns a description of each regression
+    """
+    regressions = []
+
+    for phase in GATED_LATENCIES:
+        for stat in ("p95", "p99"):
+            current = report["latency"][phase][stat]
+            previous = baseline["latency"].get(phase, {}).get(stat)
+            if current is not None and previous and current > previous * (1 + tolerance):
+                regressions.append(f"{phase} {stat} {current:.3f}s > baseline {previous:.3f}s")
+
+    current, previous = report["throughput_jobs_per_second"], baseline.get("throughput_jobs_per_second")
+    if previous and current < previous * (1 - tolerance):
+        regressions.append(f"throughput {current:.3f} jobs/s < baseline {previous:.3f} jobs/s")
+
+    current, previous = report["peak_rss_mb"], baseline.get("peak_rss_mb")
+    if current and previous and current > previous * (1 + tolerance):
+        regressions.append(f"peak RSS {current:.0f} MB > baseline {previous:.0f} MB")
+
+    if report["error_rate"] > baseline.get("error_rate", 0):
+        regressions.append(f"error rate {report['error_rate']:.2%} > baseline {baseline.get('error_rate', 0):.2%}")
+
+    max_lag = report["event_loop"]["max_lag_seconds"]
+    if max_lag is not None and max_lag > max_loop_lag:
+        regressions.append(f"event loop blocked for {max_lag * 1000:.0f} ms (limit {max_loop_lag * 1000:.0f} ms)")
+
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"\nJobs: {report['completed']} completed, {report['failed']} failed "
+          f"in {report['duration_seconds']:.1f}s ({report['throughput_jobs_per_second']:.2f} jobs/s)")
+    print(f"{'phase':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for phase, stats in report["latency"].items():
+        if not stats["count"]:
+            continue
+        print(f"{phase:<12}" + "".join(f"{stats[k]:>10.3f}" for k in ("p50", "p95", "p99", "max")))
+
+    loop = report["event_loop"]
+    if report["peak_rss_mb"]:
+        print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+    if loop["max_lag_seconds"] is not None:
+        print(f"Event loop: {loop['blocked_seconds']:.3f}s total lag, "
+              f"max {loop['max_lag_seconds'] * 1000:.1f} ms")
+    for error in sorted(set(report["errors"]))[:5]:
+        print(f"Error: {error}")
+
+
+def check_sdks():
+    """Fail early if the installed SDKs predate the APIs the app calls"""
+    from openai import AsyncOpenAI
+    if not hasattr(AsyncOpenAI(api_key="benchmark"), "videos"):
+        raise SystemExit("Error: the installed openai SDK has no client.videos; see benchmarks/README.md")
+    try:
+        from elevenlabs.client import AsyncElevenLabs  # noqa: F401
+    except ImportError:
+        raise SystemExit("Error: the installed elevenlabs SDK has no elevenlabs.client; see benchmarks/README.md")
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="relai-bench-"))
+    fake_port, api_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+
+    fake_args = [
+        sys.executable, "-m", "benchmarks.fake_providers", "--port", str(fake_port),
+        "--latency", str(args.latency),
+        "--latency-jitter", str(args.latency_jitter),
+        "--failure-rate", str(args.failure_rate),
+        "--render-seconds", str(args.render_seconds),
+        "--render-failure-rate", str(args.render_failure_rate),
+        "--music-seconds", str(args.music_seconds),
+        "--video-bytes", str(args.video_bytes),
+        "--audio-bytes", str(args.audio_bytes),
+        "--token-delay", str(args.token_delay),
+    ]
+
+    api_env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(BACKEND_DIR), os.environ.get("PYTHONPATH")])),
+        "OPENAI_API_KEY": "benchmark",
+        "ELEVENLABS_API_KEY": "benchmark",
+        "SUNO_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"{fake_url}/openai/v1",
+        "ELEVENLABS_BASE_URL": f"{fake_url}/elevenlabs",
+        "SUNO_BASE_URL": f"{fake_url}/suno/v1",
+        "MUSIC_CACHE_PREWARM": "false",
+        "POLLER_MIN_INTERVAL": "0.25",
+        "SORA_RENDER_SECONDS_PER_SECOND": str(args.render_seconds / args.duration),
+        "SUNO_EXPECTED_SECONDS": str(args.music_seconds),
+    }
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        api_env[key] = value
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen(fake_args, cwd=BACKEND_DIR))
+        await wait_until_up(f"{fake_url}/health")
+
+        # Run the API from an empty directory so uploads, videos and databases start fresh
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"],
+            cwd=workdir,
+            env=api_env
+        )
+        processes.append(api)
+        await wait_until_up(f"{api_url}/")
+
+        load_test = LoadTest(api_url, args.jobs, args.concurrency, args.duration, args.poll_interval)
+        elapsed = await load_test.run()
+
+        async with httpx.AsyncClient() as client:
+            samples = parse_metrics((await client.get(f"{api_url}/metrics")).text)
+
+        lag_count = samples.get("relai_event_loop_lag_seconds_count")
+        report = {
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "completed": load_test.completed,
+            "failed": load_test.failed,
+            "error_rate": load_test.failed / args.jobs if args.jobs else 0,
+            "duration_seconds": elapsed,
+            "throughput_jobs_per_second": load_test.completed / elapsed if elapsed else 0,
+            "latency": {phase: summarize(values) for phase, values in load_test.latencies.items()},
+            "peak_rss_mb": peak_rss_mb(api.pid),
+            "event_loop": {
+                "blocked_seconds": samples.get("relai_event_loop_lag_seconds_sum"),
+                "mean_lag_seconds": samples.get("relai_event_loop_lag_seconds_sum", 0) / lag_count if lag_count else None,
+                "max_lag_seconds": samples.get("relai_event_loop_lag_max_seconds"),
+            },
+            "errors": load_test.errors,
+        }
+        return report
+
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against fake providers")
+    parser.add_argument("--jobs", type=int, default=40, help="Total video jobs to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=int, default=15, help="Requested video duration (s)")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Client status poll interval (s)")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the API process, e.g. JOB_WORKERS=16")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--save-baseline", help="Write the report as the new baseline")
+    parser.add_argument("--baseline", help="Fail if the run regressed against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--max-loop-lag", type=float, default=0.1, help="Allowed event-loop lag (s)")
+    fake_providers.add_arguments(parser)
+    args = parser.parse_args()
+
+    check_sdks()
+    report = asyncio.run(benchmark(args))
+    print_report(report)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = check_regressions(report, baseline, args.tolerance, args.max_loop_lag)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,77 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 import os
 from dotenv import load_dotenv
-import aiofiles
 import uuid
+import hmac
+import json
+import time
 from pathlib import Path
+from contextlib import asynccontextmanager
 
 from services.sora_service import SoraService
 from services.voice_service import VoiceService
 from services.music_service import MusicService
 from services.suggestion_service import SuggestionService
+from services.pipeline_service import VideoPipeline
+from services.job_queue import JobQueue, QueueUnavailable, video_request_key, public_job
+from services.render_scheduler import RenderScheduler
+from services.job_store import create_job_store, MemoryJobStore
+from services.cluster import cluster
+from services.http_pool import http_pool
+from services.poller_service import poller
+from services.event_bus import event_bus
+from services.resilience import resilience
+from services.metrics import tracer, loop_monitor, runtime_collector, scrape_registry, HTTP_REQUEST_SECONDS
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from services.upload_service import UploadService, UploadTooLarge, InvalidUpload
+from services.upload_registry import UploadRegistry
+from services.cleanup_service import CleanupService
+from services.storage import create_storage
+from services.video_delivery import file_response
+from services.file_io import file_io
+from services.cache_utils import file_sha256
 
 load_dotenv()
 
-app = FastAPI(title="RELAI API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await loop_monitor.start()
+    await cluster.start()
+    if cluster.enabled:
+        # A job's stages may run in different worker processes
+        tracer.store = cluster
+    await http_pool.start()
+    await poller.start()
+    await event_bus.start()
+    await job_store.start()
+    await render_scheduler.start()
+    await job_queue.start()
+    await music_service.start()
+    await voice_service.start()
+    await cleanup_service.start()
+    yield
+    # Normally already set by the SIGTERM handler in services/server.py
+    cluster.begin_drain()
+    await cleanup_service.stop()
+    await voice_service.stop()
+    await music_service.stop()
+    await job_queue.stop()
+    await render_scheduler.stop()
+    await job_store.stop()
+    await event_bus.stop()
+    await poller.stop()
+    await http_pool.aclose()
+    await cluster.stop()
+    await loop_monitor.stop()
+    file_io.shutdown()
+
+
+app = FastAPI(title="RELAI API", version="1.0.0", lifespan=lifespan)
 
 # CORS configuration
 origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
@@ -35,10 +90,36 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 VIDEOS_DIR.mkdir(exist_ok=True)
 
 # Initialize services
-sora_service = SoraService()
+job_store = create_job_store()
+storage = create_storage(VIDEOS_DIR)
+sora_service = SoraService(job_store, storage)
 voice_service = VoiceService()
 music_service = MusicService()
 suggestion_service = SuggestionService()
+upload_service = UploadService()
+upload_registry = UploadRegistry(os.getenv("UPLOAD_REGISTRY_DB", "data/uploads.db"))
+cleanup_service = CleanupService(
+    upload_registry,
+    job_store,
+    [UPLOAD_DIR, UPLOAD_DIR / "music", UPLOAD_DIR / "voices", VIDEOS_DIR]
+)
+video_pipeline = VideoPipeline(sora_service, voice_service, music_service)
+render_scheduler = RenderScheduler(job_store, render_factor=sora_service.render_factor)
+job_queue = JobQueue(video_pipeline, job_store, render_scheduler)
+
+if cluster.enabled:
+    if isinstance(job_store, MemoryJobStore):
+        raise Exception("Running several workers needs a shared job store (JOB_STORE_BACKEND=sqlite)")
+    if not event_bus.broker_url:
+        print("Warning: Progress events only reach clients connected to the same worker; set EVENT_BROKER_URL")
+
+runtime_collector.add_gauge("relai_job_queue_depth", "Video jobs waiting for a worker", job_queue.queue_depth)
+runtime_collector.add_gauge("relai_render_waiting", "Jobs waiting for a render slot", render_scheduler.waiting)
+runtime_collector.add_gauge("relai_render_in_flight", "Renders holding a slot", render_scheduler.in_flight)
+runtime_collector.add_gauge("relai_poller_pending", "Provider jobs waiting on a status check", poller.pending)
+runtime_collector.add_gauge("relai_event_subscribers", "Open progress event streams", event_bus.subscriber_count)
+runtime_collector.set_providers(resilience.metrics)
+runtime_collector.set_http_pool(http_pool.metrics)
 
 
 class VideoRequest(BaseModel):
@@ -47,6 +128,10 @@ class VideoRequest(BaseModel):
     voice_type: str = "ai"  # "ai" or "custom"
     voice_file_id: Optional[str] = None
     duration: int = 30
+    force_new: bool = False  # render a new variant even if this exact request was made before
+    user_id: Optional[str] = None  # fair-share key for render scheduling; defaults to the client address
+    tier: str = "free"  # priority class, see RENDER_CLASS_WEIGHTS
+    preview: bool = False  # short low-resolution render; promote it for the full video
 
 
 class SuggestionRequest(BaseModel):
@@ -54,11 +139,61 @@ class SuggestionRequest(BaseModel):
     user_preferences: Optional[str] = None
 
 
+class SuggestionBatchRequest(BaseModel):
+    requests: List[SuggestionRequest]
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Record API latency per route template (not per concrete path)"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        request.method,
+        route.path if route else "unmatched",
+        response.status_code
+    ).observe(time.perf_counter() - started)
+    return response
+
+
+@app.middleware("http")
+async def reject_while_draining(request: Request, call_next):
+    """Turn away new uploads and jobs once this worker has started shutting down"""
+    if cluster.draining and request.method == "POST" and request.url.path.startswith(("/api/upload/", "/api/video/generate", "/api/video/promote/")):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Server is restarting, try again shortly"},
+            headers={"Retry-After": "5"}
+        )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from Content-Length before the body is parsed"""
+    if request.url.path.startswith("/api/upload/"):
+        content_length = request.headers.get("content-length")
+        if content_length and not content_length.isdigit():
+            return JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header"})
+        # Allow some room for the multipart envelope around the file
+        if content_length and int(content_length) > upload_service.max_upload_size + 64 * 1024:
+            return JSONResponse(status_code=413, content={"detail": "File too large"})
+    return await call_next(request)
+
+
 @app.get("/")
 async def root():
     return {"message": "RELAI API - Relax and create AI videos!"}
 
 
+@app.get("/api/health")
+async def health():
+    """Readiness check; answers 503 while this worker drains so load balancers move on"""
+    status = {"status": "draining" if cluster.draining else "ok", **cluster.status()}
+    return JSONResponse(status_code=503 if cluster.draining else 200, content=status)
+
+
 @app.post("/api/upload/image")
 async def upload_image(file: UploadFile = File(...)):
     """Upload user's photo for video generation"""
@@ -72,16 +207,29 @@ async def upload_image(file: UploadFile = File(...)):
         file_extension = file.filename.split(".")[-1]
         file_path = UPLOAD_DIR / f"{file_id}.{file_extension}"
 
-        # Save file
-        async with aiofiles.open(file_path, "wb") as f:
-            content = await file.read()
-            await f.write(content)
+        # Stream file to disk, then validate and re-encode it
+        await upload_service.save(file, file_path)
+        file_path = await upload_service.normalize_image(file_path)
+        # Size and hash describe the stored JPEG, which is what jobs use
+        normalized = await file_io.stat(file_path)
+        sha256 = await file_io.run(file_sha256, file_path)
+        await upload_registry.add(
+            file_id, "image", file_path, "image/jpeg", normalized.st_size, sha256
+        )
 
         return {
             "file_id": file_id,
             "filename": file.filename,
+            "size": normalized.st_size,
+            "sha256": sha256,
             "message": "Image uploaded successfully"
         }
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -99,23 +247,44 @@ async def upload_voice(file: UploadFile = File(...)):
         file_extension = file.filename.split(".")[-1]
         file_path = UPLOAD_DIR / f"voice_{file_id}.{file_extension}"
 
-        # Save file
-        async with aiofiles.open(file_path, "wb") as f:
-            content = await file.read()
-            await f.write(content)
+        # Stream file to disk
+        saved = await upload_service.save(file, file_path)
+        await upload_registry.add(
+            file_id, "voice", file_path, file.content_type, saved["size"], saved["sha256"]
+        )
 
         return {
             "file_id": file_id,
             "filename": file.filename,
+            "size": saved["size"],
+            "sha256": saved["sha256"],
             "message": "Voice uploaded successfully"
         }
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/suggestions/generate")
-async def generate_suggestions(request: SuggestionRequest):
-    """Generate video idea suggestions based on context"""
+async def generate_suggestions(request: SuggestionRequest, stream: Optional[str] = None):
+    """Generate video idea suggestions based on context
+
+    With ?stream=ndjson or ?stream=sse each suggestion is sent as soon as it is complete
+    """
+    if stream in ("ndjson", "sse"):
+        return StreamingResponse(
+            _suggestion_stream(request, stream),
+            media_type="application/x-ndjson" if stream == "ndjson" else "text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    if stream:
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+
     try:
         suggestions = await suggestion_service.generate_suggestions(
             request.context,
@@ -126,43 +295,137 @@ async def generate_suggestions(request: SuggestionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _suggestion_stream(request: SuggestionRequest, fmt: str):
+    def encode(event: str, data: dict) -> str:
+        if fmt == "sse":
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({"event": event, **data}) + "\n"
+
+    count = 0
+    try:
+        async for suggestion in suggestion_service.stream_suggestions(
+            request.context,
+            request.user_preferences
+        ):
+            count += 1
+            yield encode("suggestion", {"suggestion": suggestion})
+    except Exception as e:
+        # Headers are already sent, so the error goes in-band
+        yield encode("error", {"error": str(e)})
+        return
+    yield encode("done", {"count": count})
+
+
+@app.post("/api/suggestions/batch")
+async def generate_suggestions_batch(request: SuggestionBatchRequest):
+    """Generate suggestions for many contexts in one call"""
+    max_batch_size = int(os.getenv("SUGGESTION_BATCH_MAX_SIZE", 20))
+    if len(request.requests) > max_batch_size:
+        raise HTTPException(status_code=400, detail=f"At most {max_batch_size} contexts per batch")
+
+    try:
+        results = await suggestion_service.generate_batch(
+            [item.model_dump() for item in request.requests]
+        )
+        return {"results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/video/generate")
-async def generate_video(request: VideoRequest):
+async def generate_video(request: VideoRequest, http_request: Request):
     """Generate video using Sora 2 API with voice and music"""
     try:
+        if request.tier not in render_scheduler.tiers:
+            raise HTTPException(
+                status_code=400,
+                detail=f"tier must be one of: {', '.join(render_scheduler.tiers)}"
+            )
+
         # Get user image path
-        image_files = list(UPLOAD_DIR.glob(f"{request.user_image_id}.*"))
-        if not image_files:
+        image = await upload_registry.get(request.user_image_id, kind="image")
+        if image is None:
             raise HTTPException(status_code=404, detail="User image not found")
-        user_image_path = str(image_files[0])
-
-        # Generate music
-        music_path = await music_service.generate_music(request.prompt)
+        user_image_path = image["path"]
 
-        # Generate or use voice
-        voice_path = None
+        # Resolve custom voice sample
+        voice_sample_path = None
+        voice_sha256 = None
         if request.voice_type == "custom" and request.voice_file_id:
-            voice_files = list(UPLOAD_DIR.glob(f"voice_{request.voice_file_id}.*"))
-            if voice_files:
-                voice_path = str(voice_files[0])
-
-        if request.voice_type == "ai":
-            voice_path = await voice_service.generate_voice(request.prompt)
-
-        # Generate video with Sora 2
-        video_id = await sora_service.generate_video(
-            prompt=request.prompt,
-            image_path=user_image_path,
-            voice_path=voice_path,
-            music_path=music_path,
-            duration=request.duration
-        )
+            voice = await upload_registry.get(request.voice_file_id, kind="voice")
+            if voice:
+                voice_sample_path = voice["path"]
+                voice_sha256 = voice["sha256"]
+
+        job_args = {
+            "prompt": request.prompt,
+            "image_path": user_image_path,
+            "voice_type": request.voice_type,
+            "voice_sample_path": voice_sample_path,
+            "duration": request.duration,
+            "request_key": video_request_key(
+                image["sha256"], request.prompt, request.voice_type, voice_sha256, request.duration,
+                preview=request.preview
+            ),
+            "user_id": request.user_id or (http_request.client.host if http_request.client else None),
+            "tier": request.tier,
+            "preview": request.preview,
+        }
+
+        # Queue the job; music, voice and Sora 2 run in the background workers
+        # Identical requests attach to the existing job instead of rendering again
+        job = await job_queue.enqueue(**job_args, force_new=request.force_new)
+
+        if job["status"] == "completed" and not await storage.stat(f"{job['video_id']}.mp4"):
+            # The earlier result has been cleaned up since; render it again
+            job = await job_queue.enqueue(**job_args, force_new=True)
 
         return {
-            "video_id": video_id,
-            "status": "processing",
-            "message": "Video generation started"
+            "video_id": job["video_id"],
+            "status": job["status"],
+            "preview": request.preview,
+            "deduplicated": job["deduplicated"],
+            "message": "Existing video for this request" if job["deduplicated"] else "Video generation queued"
         }
+    except HTTPException:
+        raise
+    except QueueUnavailable as e:
+        # Backpressure: the client should retry, nothing failed on our side
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/video/promote/{video_id}")
+async def promote_video(video_id: str):
+    """Render a preview at full quality, reusing its audio, uploads and seed"""
+    try:
+        preview = await job_store.get(video_id)
+        if preview is None:
+            raise HTTPException(status_code=404, detail="Video job not found")
+        if not preview.get("preview"):
+            raise HTTPException(status_code=400, detail="Only preview jobs can be promoted")
+        if "voice_path" not in preview:
+            raise HTTPException(status_code=409, detail="Preview audio is not ready yet, try again shortly")
+
+        job = await job_queue.promote(video_id)
+
+        if job["status"] == "completed" and not await storage.stat(f"{job['video_id']}.mp4"):
+            # The earlier full render has been cleaned up since; render it again
+            job = await job_queue.promote(video_id, force_new=True)
+
+        return {
+            "video_id": job["video_id"],
+            "status": job["status"],
+            "promoted_from": video_id,
+            "deduplicated": job["deduplicated"],
+            "message": "Already promoted" if job["deduplicated"] else "Full render queued"
+        }
+    except HTTPException:
+        raise
+    except QueueUnavailable as e:
+        # Backpressure: the client should retry, nothing failed on our side
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -171,30 +434,130 @@ async def generate_video(request: VideoRequest):
 async def get_video_status(video_id: str):
     """Check video generation status"""
     try:
-        status = await sora_service.get_video_status(video_id)
+        job = await sora_service.get_video_status(video_id)
+        status = public_job(job)
+        # Queue position and ETA while the job waits for or holds a render slot
+        status.update(await render_scheduler.estimate(job))
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/video/download/{video_id}")
-async def download_video(video_id: str):
-    """Download generated video"""
+@app.get("/api/video/events/{video_id}")
+async def stream_video_events(video_id: str):
+    """Server-sent events with per-stage progress for a video job"""
+    async def event_stream():
+        async for event in job_queue.events(video_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/api/video/ws/{video_id}")
+async def video_events_websocket(websocket: WebSocket, video_id: str):
+    """WebSocket with per-stage progress for a video job"""
+    await websocket.accept()
     try:
-        video_path = VIDEOS_DIR / f"{video_id}.mp4"
-        if not video_path.exists():
+        async for event in job_queue.events(video_id):
+            await websocket.send_json(event or {"video_id": video_id, "event": "heartbeat"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/api/webhooks/{provider}")
+async def provider_webhook(provider: str, request: Request):
+    """Completion callback from Sora or Suno; triggers an immediate status check"""
+    secret = os.getenv("WEBHOOK_SECRET")
+    if secret and not hmac.compare_digest(request.headers.get("x-webhook-secret", ""), secret):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    if provider not in ("sora", "suno"):
+        raise HTTPException(status_code=404, detail="Unknown provider")
+
+    payload = await request.json()
+    # OpenAI wraps the job in "data"; Suno sends it at the top level
+    job_id = (payload.get("data") or {}).get("id") or payload.get("id")
+    if not job_id:
+        raise HTTPException(status_code=400, detail="Missing job id")
+
+    key = f"{provider}:{job_id}"
+    received = poller.notify(key)
+    if not received and cluster.enabled:
+        # The job may be waiting in another worker process
+        await cluster.nudge(key)
+        received = True
+    return {"received": received}
+
+
+@app.get("/api/metrics/http")
+async def get_http_pool_metrics():
+    """Shared HTTP connection pool usage"""
+    return http_pool.metrics()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(scrape_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/video/trace/{video_id}")
+async def get_video_trace(video_id: str):
+    """Timed spans for each stage of a video job"""
+    spans = await tracer.get(video_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="No trace recorded for this video")
+    return {"video_id": video_id, "spans": spans}
+
+
+@app.get("/api/metrics/providers")
+async def get_provider_metrics():
+    """Rate limiter, retry and circuit breaker state per upstream provider"""
+    return resilience.metrics()
+
+
+@app.api_route("/api/video/download/{video_id}", methods=["GET", "HEAD"])
+async def download_video(video_id: str, request: Request):
+    """Download generated video (supports Range and conditional requests)"""
+    try:
+        key = f"{video_id}.mp4"
+        filename = f"relai_video_{video_id}.mp4"
+
+        # Checked first for remote storage too (head_object), so a missing or
+        # cleaned-up video is our 404, not the bucket's error behind a redirect
+        stat = await storage.stat(key)
+        if stat is None:
             raise HTTPException(status_code=404, detail="Video not found")
 
-        return FileResponse(
-            path=str(video_path),
+        # Remote storage hands out a pre-signed URL instead of proxying the bytes
+        presigned_url = await storage.presigned_url(key, filename)
+        if presigned_url:
+            return RedirectResponse(presigned_url, status_code=307)
+
+        return file_response(
+            request,
+            storage.local_path(key),
+            size=stat["size"],
+            mtime=stat["mtime"],
             media_type="video/mp4",
-            filename=f"relai_video_{video_id}.mp4"
+            filename=filename
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 if __name__ == "__main__":
+    # Development server with auto-reload; production runs `python -m services.server`
     import uvicorn
     port = int(os.getenv("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
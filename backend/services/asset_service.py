@@ -0,0 +1,113 @@
+import os
+import time
+import asyncio
+from typing import Optional
+from services.cache_utils import SingleFlight, file_sha256
+from services.resilience import resilience
+from services.file_io import file_io
+from services.sqlite_db import SQLiteDB
+
+
+class AssetRegistry:
+    """
+    Persistent mapping from a local file's content hash to its provider-side file id
+    """
+
+    def __init__(self, path: str):
+        self.db = SQLiteDB(path)
+        self.db.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS provider_files (
+                sha256 TEXT NOT NULL,
+                purpose TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (sha256, purpose)
+            )
+            """
+        )
+
+    async def get(self, sha256: str, purpose: str, max_age: float) -> Optional[str]:
+        return await asyncio.to_thread(self._get, sha256, purpose, time.time() - max_age)
+
+    async def put(self, sha256: str, purpose: str, file_id: str):
+        await asyncio.to_thread(self._put, sha256, purpose, file_id)
+
+    async def remove(self, sha256: str, purpose: str):
+        await asyncio.to_thread(self._remove, sha256, purpose)
+
+    def _get(self, sha256: str, purpose: str, cutoff: float) -> Optional[str]:
+        with self.db.lock:
+            row = self.db.conn.execute(
+                "SELECT file_id FROM provider_files WHERE sha256 = ? AND purpose = ? AND created_at >= ?",
+                (sha256, purpose, cutoff)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _put(self, sha256: str, purpose: str, file_id: str):
+        with self.db.lock:
+            self.db.conn.execute(
+                "INSERT OR REPLACE INTO provider_files (sha256, purpose, file_id, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (sha256, purpose, file_id, time.time())
+            )
+
+    def _remove(self, sha256: str, purpose: str):
+        with self.db.lock:
+            self.db.conn.execute(
+                "DELETE FROM provider_files WHERE sha256 = ? AND purpose = ?", (sha256, purpose)
+            )
+
+
+class AssetService:
+    """
+    Uploads Sora input files once and hands out provider file ids by reference
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.registry = AssetRegistry(os.getenv("ASSET_DB", "data/assets.db"))
+        self.max_age = float(os.getenv("ASSET_FILE_TTL_DAYS", 30)) * 86400
+        self.single_flight = SingleFlight()
+
+    async def get_file_id(self, path: str, purpose: str) -> str:
+        """
+        Return the provider file id for a local file, uploading it only if its content is new
+        """
+        # Chunked hash in a worker thread, never a full read on the event loop
+        sha256 = await file_io.run(file_sha256, path)
+
+        file_id = await self.registry.get(sha256, purpose, self.max_age)
+        if file_id:
+            return file_id
+
+        return await self.single_flight.do(
+            f"{purpose}:{sha256}", lambda: self._upload(sha256, path, purpose)
+        )
+
+    async def invalidate(self, path: str, purpose: str):
+        """
+        Forget a cached file id, e.g. after the provider reports it missing
+        """
+        sha256 = await file_io.run(file_sha256, path)
+        await self.registry.remove(sha256, purpose)
+
+    async def _upload(self, sha256: str, path: str, purpose: str) -> str:
+        file_id = await self.registry.get(sha256, purpose, self.max_age)
+        if file_id:
+            return file_id
+
+        # Sora inputs are small (normalized images, voice samples): read them once
+        # in a worker thread and send the same bytes on every attempt
+        data = await file_io.read_bytes(path)
+        # Creating a file is billable and not idempotent: only resend requests
+        # the provider can't have received, never after a timeout
+        uploaded = await resilience.guard("openai").call(
+            self.client.files.create,
+            file=(os.path.basename(path), data),
+            purpose=purpose,
+            idempotent=False
+        )
+
+        await self.registry.put(sha256, purpose, uploaded.id)
+        return uploaded.id
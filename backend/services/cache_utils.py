@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import asyncio
+from pathlib import Path
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Any
+
+
+def cache_key(*parts) -> str:
+    """
+    Stable content hash for a tuple of JSON-serializable values
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into a single execution
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled waiter doesn't cancel the shared call
+        return await asyncio.shield(future)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+
+class TTLCache:
+    """
+    In-memory cache bounded by entry count (LRU) and age (TTL)
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    SHA-256 of a file, read in chunks (blocking; run it in a thread)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def touch(path: Path):
+    """
+    Mark a cached file as recently used (mtime drives LRU eviction)
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def link_or_copy(src: Path, dest: Path):
+    """
+    Hard-link a cached file to a per-request path so eviction can't pull it from under a job
+    """
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def evict_lru(directory: Path, max_bytes: int, pattern: str = "**/*") -> int:
+    """
+    Delete least recently used files under directory until it fits in max_bytes
+    Returns the number of bytes freed
+    """
+    files = []
+    total = 0
+    for path in Path(directory).glob(pattern):
+        if not path.is_file() or path.name.endswith(".part"):
+            continue
+        stat = path.stat()
+        files.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    freed = 0
+    for _, size, path in sorted(files):
+        if total - freed <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        freed += size
+
+    return freed
@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+from pathlib import Path
+from typing import List, Set
+from services.file_io import file_io
+from services.cluster import cluster
+from services.job_queue import JobState
+
+# Job fields holding input files a job still needs until it finishes
+JOB_INPUT_FIELDS = ("image_path", "voice_sample_path", "voice_path", "music_path")
+
+
+class CleanupService:
+    """
+    Background janitor for uploads and generated media
+    Removes files past their TTL and keeps the media directories under a disk quota
+    Cache subdirectories are left alone; they enforce their own quotas, and files
+    that unfinished jobs still need are never removed
+    """
+
+    def __init__(self, upload_registry, job_store, media_dirs: List[Path]):
+        self.upload_registry = upload_registry
+        self.job_store = job_store
+        self.media_dirs = [Path(d) for d in media_dirs]
+        self.media_ttl = float(os.getenv("MEDIA_TTL_HOURS", 48)) * 3600
+        self.disk_quota = int(os.getenv("MEDIA_DISK_QUOTA_BYTES", 20 * 1024 ** 3))
+        self.interval = float(os.getenv("CLEANUP_INTERVAL", 600))
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_once(self) -> dict:
+        in_use = await self._files_in_use()
+        expired_uploads = await self.upload_registry.remove_expired(keep=in_use)
+        removed = []
+        expired_media = await file_io.run(self._remove_expired_media, in_use, removed)
+        freed_bytes = await file_io.run(self._enforce_quota, in_use, removed)
+        # Uploads swept here must disappear from the registry too, so requests
+        # naming them get a clean 404 instead of failing at render time
+        await self.upload_registry.remove_paths([str(path) for path in removed])
+        return {
+            "expired_uploads": expired_uploads,
+            "expired_media": expired_media,
+            "freed_bytes": freed_bytes,
+        }
+
+    async def _loop(self):
+        while True:
+            try:
+                # With several worker processes only the leader sweeps
+                if cluster.is_leader:
+                    await self.run_once()
+            except Exception as e:
+                print(f"Warning: Cleanup failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _files_in_use(self) -> Set[str]:
+        """
+        Absolute paths of the inputs of every job that hasn't finished
+        """
+        jobs = await self.job_store.list_by_status(JobState.TRANSITIONS.keys() - JobState.TERMINAL)
+        return {
+            os.path.abspath(job[field])
+            for job in jobs
+            for field in JOB_INPUT_FIELDS
+            if job.get(field)
+        }
+
+    def _media_files(self, in_use: Set[str]) -> List[tuple]:
+        """
+        (mtime, size, path) for every top-level file in the media directories
+        that no unfinished job needs
+        """
+        files = []
+        for directory in self.media_dirs:
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                if not path.is_file() or path.name.endswith(".part") or os.path.abspath(path) in in_use:
+                    continue
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _remove_expired_media(self, in_use: Set[str], removed: List[Path]) -> int:
+        cutoff = time.time() - self.media_ttl
+        count = 0
+        for mtime, _, path in self._media_files(in_use):
+            if mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed.append(path)
+                count += 1
+        return count
+
+    def _enforce_quota(self, in_use: Set[str], removed: List[Path]) -> int:
+        files = self._media_files(in_use)
+        total = sum(size for _, size, _ in files)
+
+        freed = 0
+        for _, size, path in sorted(files):
+            if total - freed <= self.disk_quota:
+                break
+            path.unlink(missing_ok=True)
+            removed.append(path)
+            freed += size
+        return freed
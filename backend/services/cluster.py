@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+from services.poller_service import poller
+from services.sqlite_db import SQLiteDB
+
+LEADER_LEASE = "leader"
+
+
+class Cluster:
+    """
+    Coordination between the worker processes of one server (SERVER_WORKERS > 1)
+    A leader lease in a small shared SQLite database picks the one process that
+    owns the render poller and the housekeeping loops; webhook nudges are written
+    there too so they reach whichever process is waiting on that provider job, and
+    trace spans so a job's trace can be read from any process
+    With a single worker this process is always the leader and nothing is stored
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv("SERVER_WORKERS") or os.getenv("WEB_CONCURRENCY") or 1)
+        self.enabled = self.workers > 1
+        self.path = os.getenv("CLUSTER_DB", "data/cluster.db")
+        self.lease_ttl = float(os.getenv("CLUSTER_LEASE_TTL", 15))
+        self.tick_interval = float(os.getenv("CLUSTER_TICK_INTERVAL", 1))
+        self.trace_retention = float(os.getenv("TRACE_RETENTION_HOURS", 24)) * 3600
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = not self.enabled
+        self.draining = False
+        self.db = None
+        self._task = None
+        self._last_nudge = 0
+
+    async def start(self):
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self._open)
+        # Elect before the other services start so leader-only work begins right away
+        await self._elect()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.db is not None and self.is_leader:
+            # Hand leadership over now instead of when the lease runs out
+            await asyncio.to_thread(self._release, LEADER_LEASE)
+            self.is_leader = False
+
+    def begin_drain(self):
+        """
+        Stop taking new work; health checks report the worker as draining
+        """
+        if not self.draining:
+            self.draining = True
+            print(f"Draining worker {self.worker_id}")
+
+    async def nudge(self, key: str):
+        """
+        Forward a webhook to every worker process; the one polling key checks it right away
+        """
+        await asyncio.to_thread(self._insert_nudge, key)
+
+    async def add_spans(self, spans: list):
+        await asyncio.to_thread(self._insert_spans, spans)
+
+    async def get_spans(self, trace_id: str) -> list:
+        return await asyncio.to_thread(self._select_spans, trace_id)
+
+    def status(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "workers": self.workers,
+            "leader": self.is_leader,
+            "draining": self.draining,
+        }
+
+    async def _loop(self):
+        last_election = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                # Renew well before the lease can run out
+                if time.monotonic() - last_election >= self.lease_ttl / 3:
+                    last_election = time.monotonic()
+                    await self._elect()
+                for key in await asyncio.to_thread(self._read_nudges):
+                    poller.notify(key)
+            except Exception as e:
+                print(f"Warning: Cluster coordination failed: {str(e)}")
+
+    async def _elect(self):
+        leader = await asyncio.to_thread(self._try_acquire, LEADER_LEASE)
+        if leader != self.is_leader:
+            print(f"Worker {self.worker_id} {'is now' if leader else 'is no longer'} the leader")
+        self.is_leader = leader
+
+    def _open(self):
+        self.db = SQLiteDB(self.path)
+        self.db.conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.db.conn.execute(
+            "CREATE TABLE IF NOT EXISTS nudges (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.db.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spans (span_id TEXT PRIMARY KEY, trace_id TEXT NOT NULL, start REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self.db.conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_trace_id ON spans (trace_id)")
+        row = self.db.conn.execute("SELECT COALESCE(MAX(id), 0) FROM nudges").fetchone()
+        self._last_nudge = row[0]
+
+    def _try_acquire(self, name: str) -> bool:
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT owner, expires_at FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+            acquired = row is None or row[0] == self.worker_id or row[1] < now
+            if acquired:
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (name, self.worker_id, now + self.lease_ttl)
+                )
+        return acquired
+
+    def _release(self, name: str):
+        with self.db.lock:
+            self.db.conn.execute(
+                "DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.worker_id)
+            )
+
+    def _insert_nudge(self, key: str):
+        with self.db.lock:
+            self.db.conn.execute(
+                "INSERT INTO nudges (key, created_at) VALUES (?, ?)", (key, time.time())
+            )
+
+    def _read_nudges(self) -> list:
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                "SELECT id, key FROM nudges WHERE id > ? ORDER BY id", (self._last_nudge,)
+            ).fetchall()
+            if self.is_leader:
+                self.db.conn.execute(
+                    "DELETE FROM nudges WHERE created_at < ?", (time.time() - 10 * self.lease_ttl,)
+                )
+                self.db.conn.execute(
+                    "DELETE FROM spans WHERE start < ?", (time.time() - self.trace_retention,)
+                )
+        if rows:
+            self._last_nudge = rows[-1][0]
+        return [row[1] for row in rows]
+
+    def _insert_spans(self, spans: list):
+        with self.db.lock:
+            self.db.conn.executemany(
+                "INSERT OR REPLACE INTO spans (span_id, trace_id, start, data) VALUES (?, ?, ?, ?)",
+                [(s["span_id"], s["trace_id"], s["start"], json.dumps(s, default=str)) for s in spans]
+            )
+
+    def _select_spans(self, trace_id: str) -> list:
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                "SELECT data FROM spans WHERE trace_id = ? ORDER BY start", (trace_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+cluster = Cluster()
@@ -0,0 +1,120 @@
+import os
+import hashlib
+import asyncio
+import httpx
+from pathlib import Path
+from typing import Optional
+from services.http_pool import http_pool
+from services.file_io import file_io
+
+CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_ATTEMPTS = int(os.getenv("DOWNLOAD_MAX_ATTEMPTS", 3))
+
+
+def _hash_file(path: Path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _range_total(response: httpx.Response) -> Optional[int]:
+    """
+    Total size from a Content-Range header ("bytes 0-99/1234" or "bytes */1234")
+    """
+    content_range = response.headers.get("content-range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    return None
+
+
+def _content_length(response: httpx.Response, offset: int) -> Optional[int]:
+    """
+    Total size of the remote file, taken from Content-Range when resuming
+    """
+    total = _range_total(response)
+    if total is not None:
+        return total
+
+    length = response.headers.get("content-length")
+    if length and length.isdigit():
+        return int(length) + offset
+    return None
+
+
+async def download_file(
+    url: str,
+    dest: Path,
+    expected_sha256: Optional[str] = None,
+    headers: Optional[dict] = None
+) -> dict:
+    """
+    Stream a remote file to disk in chunks
+    Writes to a .part file, resumes it with HTTP Range after a dropped connection,
+    verifies length and checksum, then atomically renames it into place
+    A .part file that is already complete (a crash before the rename) is kept
+    as is; one that no longer matches the remote file is discarded
+    """
+    dest = Path(dest)
+    part_path = dest.with_name(dest.name + ".part")
+    last_error = None
+
+    for attempt in range(MAX_ATTEMPTS):
+        part_stat = await file_io.stat(part_path)
+        offset = part_stat.st_size if part_stat else 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+
+        try:
+            async with http_pool.client.stream("GET", url, headers=request_headers) as response:
+                if offset and response.status_code == 416:
+                    total = _range_total(response)
+                    if total != offset:
+                        # Nothing past our end but a different size: not the same file
+                        await file_io.unlink(part_path)
+                        last_error = Exception("Partial download does not match the remote file")
+                        continue
+                    # Every byte is already on disk
+                    digest = await file_io.run(_hash_file, part_path)
+                else:
+                    if offset and response.status_code != 206:
+                        # Server ignored the Range header, start over
+                        offset = 0
+
+                    if response.status_code not in (200, 206):
+                        raise Exception(f"Download failed with status {response.status_code}")
+
+                    total = _content_length(response, offset)
+
+                    if offset:
+                        digest = await file_io.run(_hash_file, part_path)
+                    else:
+                        digest = hashlib.sha256()
+
+                    # Hashing happens in the I/O thread along with the writes
+                    async with file_io.open_writer(part_path, "ab" if offset else "wb", digest=digest) as f:
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            await f.write(chunk)
+
+            size = (await file_io.stat(part_path)).st_size
+            if total is not None and size != total:
+                raise httpx.TransportError(f"Incomplete download: got {size} of {total} bytes")
+
+            sha256 = digest.hexdigest()
+            if expected_sha256 and sha256 != expected_sha256:
+                await file_io.unlink(part_path)
+                raise Exception("Download checksum mismatch")
+
+            await file_io.replace(part_path, dest)
+            return {"path": str(dest), "size": size, "sha256": sha256}
+
+        except httpx.TransportError as e:
+            # Keep the partial file so the next attempt can resume it
+            last_error = e
+            await asyncio.sleep(2 ** attempt)
+
+    raise Exception(f"Download failed after {MAX_ATTEMPTS} attempts: {str(last_error)}")
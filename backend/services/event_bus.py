@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class RedisBroker:
+    """
+    Cross-worker fan-out over Redis pub/sub (optional dependency)
+    """
+
+    def __init__(self, url: str, prefix: str = "relai:events:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise Exception("The Redis event broker requires redis: pip install redis")
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+        self._pubsub = None
+
+    async def publish(self, channel: str, event: dict):
+        await self.redis.publish(self.prefix + channel, json.dumps(event))
+
+    async def listen(self, deliver):
+        """
+        Forward every broker message to deliver(channel, event)
+        """
+        if self._pubsub is not None:
+            # Left over from a dropped connection
+            await self._pubsub.close()
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.psubscribe(self.prefix + "*")
+        async for message in self._pubsub.listen():
+            if message["type"] != "pmessage":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            deliver(channel[len(self.prefix):], json.loads(message["data"]))
+
+    async def close(self):
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        await self.redis.close()
+
+
+class EventBus:
+    """
+    In-process pub/sub for job progress events
+    With EVENT_BROKER_URL set, events go through Redis so every worker sees them
+    """
+
+    def __init__(self):
+        self.queue_size = int(os.getenv("EVENT_QUEUE_SIZE", 100))
+        self.broker_url = os.getenv("EVENT_BROKER_URL")
+        self.broker: Optional[RedisBroker] = None
+        self.reconnect_max_delay = float(os.getenv("EVENT_BROKER_RECONNECT_MAX_DELAY", 30))
+        self._subscribers = {}
+        self._listener = None
+
+    async def start(self):
+        if self.broker_url:
+            self.broker = RedisBroker(self.broker_url)
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        """
+        Keep the broker subscription alive, reconnecting with backoff when it drops
+        """
+        delay = 1.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self.broker.listen(self._deliver)
+                print("Warning: Event broker subscription ended, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: Event broker connection lost: {str(e)}")
+            if time.monotonic() - started > self.reconnect_max_delay:
+                # It was up for a while: this is a fresh outage
+                delay = 1.0
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self.broker:
+            await self.broker.close()
+            self.broker = None
+
+    async def publish(self, channel: str, event: dict):
+        event = {**event, "timestamp": time.time()}
+        if self.broker:
+            # The broker echoes the event back to every worker, including this one
+            await self.broker.publish(channel, event)
+        else:
+            self._deliver(channel, event)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._subscribers.values())
+
+    def _deliver(self, channel: str, event: dict):
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the publisher
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+event_bus = EventBus()
@@ -0,0 +1,164 @@
+import os
+import shutil
+import asyncio
+import functools
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, AsyncIterator, Callable
+
+# When to fsync files written through FileWriter:
+#   "never"  - leave it to the OS (fastest; a crash can lose recent writes)
+#   "close"  - once before the file is closed, so a following rename is durable
+#   "always" - after every flushed batch
+FSYNC_POLICIES = ("never", "close", "always")
+
+
+class FileWriter:
+    """
+    Buffered async file writer
+    Small writes are collected in memory and handed to the I/O pool in batches,
+    so a stream of 64 KB chunks costs one thread hop per buffer, not one per chunk
+    An optional hashlib digest is updated in the I/O thread as the bytes are written
+    """
+
+    def __init__(self, file_io: "FileIO", path: Path, mode: str, fsync: str, digest=None):
+        self.file_io = file_io
+        self.path = Path(path)
+        self.mode = mode
+        self.fsync = fsync
+        self.size = 0
+        self._digest = digest
+        self._buffer = []
+        self._buffered = 0
+        self._file = None
+
+    async def __aenter__(self) -> "FileWriter":
+        self._file = await self.file_io.run(open, self.path, self.mode)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self.flush()
+                if self.fsync in ("close", "always"):
+                    await self.file_io.run(os.fsync, self._file.fileno())
+        finally:
+            await self.file_io.run(self._file.close)
+
+    async def write(self, data: bytes):
+        if not data:
+            return
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.size += len(data)
+        if self._buffered >= self.file_io.buffer_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        chunks, self._buffer, self._buffered = self._buffer, [], 0
+        await self.file_io.run(self._write_batch, chunks)
+
+    def _write_batch(self, chunks: list):
+        for chunk in chunks:
+            if self._digest is not None:
+                self._digest.update(chunk)
+            self._file.write(chunk)
+        self._file.flush()
+        if self.fsync == "always":
+            os.fsync(self._file.fileno())
+
+
+class FileIO:
+    """
+    Every blocking filesystem call goes through one bounded thread pool
+    Keeps disk I/O off the event loop without letting a burst of large files
+    spawn an unbounded number of threads
+    """
+
+    def __init__(self):
+        self.max_workers = int(os.getenv("FILE_IO_THREADS", 8))
+        self.buffer_size = int(os.getenv("FILE_IO_BUFFER_SIZE", 1024 * 1024))
+        self.read_chunk_size = int(os.getenv("FILE_IO_READ_CHUNK_SIZE", 256 * 1024))
+        self.fsync = os.getenv("FILE_IO_FSYNC", "close")
+        if self.fsync not in FSYNC_POLICIES:
+            raise Exception(f"FILE_IO_FSYNC must be one of {', '.join(FSYNC_POLICIES)}")
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="file-io")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run a blocking call on the I/O pool
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def open_writer(
+        self,
+        path: Path,
+        mode: str = "wb",
+        fsync: Optional[str] = None,
+        digest=None
+    ) -> FileWriter:
+        return FileWriter(self, path, mode, fsync or self.fsync, digest)
+
+    async def read_chunks(
+        self,
+        path: Path,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield the bytes of path from start to end (inclusive)
+        """
+        chunk_size = chunk_size or self.read_chunk_size
+        f = await self.run(open, path, "rb")
+        try:
+            await self.run(f.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await self.run(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await self.run(f.close)
+
+    async def read_bytes(self, path: Path) -> bytes:
+        return await self.run(Path(path).read_bytes)
+
+    async def stat(self, path: Path) -> Optional[os.stat_result]:
+        try:
+            return await self.run(os.stat, path)
+        except FileNotFoundError:
+            return None
+
+    async def exists(self, path: Path) -> bool:
+        return await self.run(os.path.exists, path)
+
+    async def replace(self, src: Path, dest: Path):
+        await self.run(os.replace, src, dest)
+
+    async def unlink(self, path: Path):
+        await self.run(Path(path).unlink, missing_ok=True)
+
+    async def copy(self, src: Path, dest: Path):
+        await self.run(shutil.copyfile, src, dest)
+
+
+file_io = FileIO()
@@ -0,0 +1,85 @@
+import os
+import httpx
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPPool:
+    """
+    Application-lifetime HTTP connection pool shared by every service
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+        self.max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+        self.timeout = float(os.getenv("HTTP_TIMEOUT", 60))
+        self.http2 = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and _http2_available()
+        self._client = None
+        self.stats = {
+            "requests_total": 0,
+            "responses_total": 0,
+            "errors_total": 0,
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                event_hooks={
+                    "request": [self._on_request],
+                    "response": [self._on_response]
+                }
+            )
+        return self._client
+
+    async def start(self):
+        # Create the client up front so the first request doesn't pay for it
+        self.client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def metrics(self) -> dict:
+        """
+        Snapshot of pool usage: request counters plus open/idle connection counts
+        """
+        connections = []
+        if self._client is not None:
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+
+        return {
+            **self.stats,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+        }
+
+    async def _on_request(self, request: httpx.Request):
+        self.stats["requests_total"] += 1
+
+    async def _on_response(self, response: httpx.Response):
+        self.stats["responses_total"] += 1
+        if response.status_code >= 400:
+            self.stats["errors_total"] += 1
+
+
+http_pool = HTTPPool()
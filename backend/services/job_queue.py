@@ -0,0 +1,544 @@
+import os
+import time
+import uuid
+import asyncio
+import itertools
+from typing import Optional
+from services.event_bus import event_bus
+from services.cache_utils import cache_key
+from services.metrics import tracer, JOBS_IN_FLIGHT, JOBS_FINISHED
+from services.cluster import cluster
+from services.file_io import file_io
+from services.sora_service import DEFAULT_RESOLUTION, DEFAULT_FPS
+
+
+class QueueUnavailable(Exception):
+    """
+    The queue can't take a job right now (full, draining or not running); retry later
+    """
+    pass
+
+
+class JobState:
+    QUEUED = "queued"
+    GENERATING_AUDIO = "generating_audio"
+    SUBMITTING = "submitting"
+    RENDERING = "rendering"
+    DOWNLOADING = "downloading"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    TERMINAL = {COMPLETED, FAILED}
+
+    # Allowed transitions; any non-terminal state may also move to FAILED
+    TRANSITIONS = {
+        QUEUED: {GENERATING_AUDIO},
+        GENERATING_AUDIO: {SUBMITTING},
+        SUBMITTING: {RENDERING},
+        RENDERING: {DOWNLOADING},
+        DOWNLOADING: {COMPLETED},
+        COMPLETED: set(),
+        FAILED: set(),
+    }
+
+
+def video_request_key(
+    image_sha256: str,
+    prompt: str,
+    voice_type: str,
+    voice_sha256: Optional[str],
+    duration: int,
+    preview: bool = False
+) -> str:
+    """
+    Identity of a generation request: same image content, prompt, voice, duration and mode
+    """
+    parts = ["video", image_sha256, " ".join(prompt.split()), voice_type, voice_sha256, duration]
+    if preview:
+        parts.append("preview")
+    return cache_key(*parts)
+
+
+# Job fields any caller holding the video_id may see; the rest (user, tier,
+# lease, server paths, provider ids) stays server-side
+PUBLIC_FIELDS = ("video_id", "status", "error", "preview", "promoted_from", "created_at", "updated_at")
+
+
+def public_job(job: dict) -> dict:
+    """
+    The status a client sees for a stored job
+    """
+    public = {field: job[field] for field in PUBLIC_FIELDS if job.get(field) is not None}
+    if job["status"] == JobState.COMPLETED:
+        public["video_url"] = f"/api/video/download/{job['video_id']}"
+    return public
+
+
+class JobQueue:
+    """
+    Worker pool for video jobs
+    Workers lease each job in the job store before running it, so with several
+    server processes a job runs in exactly one of them; leases are renewed while
+    held, and jobs whose lease lapses (crashed or drained process) are claimed by
+    the recovery scan of any live process
+    Workers only hold a job while it has work to do: a job waiting for a render
+    slot is left to the scheduler and a rendering job to the leader's poller, and
+    either is queued again once it can continue. New jobs are taken in fair order
+    across users (start-time fair queuing, weighted by tier), so one user's
+    backlog can't keep everyone else's jobs from reaching the scheduler
+    """
+
+    def __init__(self, pipeline, job_store, scheduler):
+        self.pipeline = pipeline
+        self.job_store = job_store
+        self.scheduler = scheduler
+        self.num_workers = int(os.getenv("JOB_WORKERS", 8))
+        self.max_queue_size = int(os.getenv("JOB_QUEUE_SIZE", 1000))
+        self.lease_ttl = float(os.getenv("JOB_LEASE_TTL", 30))
+        self.recovery_interval = float(os.getenv("JOB_RECOVERY_INTERVAL", 5))
+        self.drain_timeout = float(os.getenv("JOB_DRAIN_TIMEOUT", 30))
+        self.owner = cluster.worker_id
+        self.scheduler.on_grant = self._resume
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._user_tags = {}
+        self._reserved = 0
+        self.workers = {}
+        self.running = {}
+        self.draining = False
+        self._maintainer = None
+        self._watching = {}
+
+    async def start(self):
+        """
+        Start the worker pool and claim jobs left unfinished by a previous run
+        """
+        self.queue = asyncio.PriorityQueue(maxsize=self.max_queue_size)
+        self.draining = False
+        self.workers = {
+            i: asyncio.create_task(self._worker(i)) for i in range(self.num_workers)
+        }
+        await self.recover()
+        if cluster.is_leader:
+            await self.watch_renders()
+        self._maintainer = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        """
+        Drain the worker pool: take no new jobs, give running jobs up to
+        drain_timeout to finish, then cancel the rest
+        Every job keeps its last checkpointed state and its lease is released,
+        so another process (or this one after a restart) resumes it
+        """
+        self.draining = True
+        if self._maintainer:
+            self._maintainer.cancel()
+            await asyncio.gather(self._maintainer, return_exceptions=True)
+            self._maintainer = None
+
+        busy = [self.workers[i] for i in self.running]
+        for i, worker in self.workers.items():
+            if i not in self.running:
+                worker.cancel()
+        if busy:
+            _, unfinished = await asyncio.wait(busy, timeout=self.drain_timeout)
+            for worker in unfinished:
+                worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers = {}
+
+        await self.stop_watching()
+        await self.job_store.release_leases(self.owner)
+
+    async def enqueue(
+        self,
+        prompt: str,
+        image_path: str,
+        voice_type: str = "ai",
+        voice_sample_path: Optional[str] = None,
+        duration: int = 30,
+        request_key: Optional[str] = None,
+        force_new: bool = False,
+        user_id: Optional[str] = None,
+        tier: str = "free",
+        preview: bool = False
+    ) -> dict:
+        """
+        Record a new video job and hand it to the worker pool
+        A preview renders a short low-resolution clip; promote() turns it into the full video
+        With a request_key, an identical request that is queued, running or completed
+        is returned instead (unless force_new), flagged with "deduplicated"
+        Returns the job immediately
+        """
+        now = time.time()
+        job = {
+            "video_id": str(uuid.uuid4()),
+            "status": JobState.QUEUED,
+            "prompt": prompt,
+            "image_path": image_path,
+            "voice_type": voice_type,
+            "voice_sample_path": voice_sample_path,
+            **self.pipeline.render_settings(duration, preview),
+            "request_key": request_key,
+            "user_id": user_id,
+            "tier": tier,
+            "created_at": now,
+            "updated_at": now,
+        }
+        return await self._submit(job, dedupe=bool(request_key) and not force_new)
+
+    async def promote(self, video_id: str, force_new: bool = False) -> dict:
+        """
+        Queue the full-quality render of a preview: same prompt, image, audio stems,
+        seed and user, at the full duration and default resolution
+        Starts at submission since the stems are reused; promoting twice returns
+        the same job, flagged with "deduplicated"
+        """
+        preview = await self.job_store.get(video_id)
+        if preview is None:
+            raise Exception("Video job not found")
+        if not preview.get("preview"):
+            raise Exception("Only preview jobs can be promoted")
+        if "voice_path" not in preview:
+            raise Exception("Preview audio is not ready yet, try again shortly")
+
+        full = self.pipeline.render_settings(preview["audio_duration"])
+        stems = [path for path in (preview.get("voice_path"), preview.get("music_path")) if path]
+        # Stems removed by media cleanup since are simply generated again (usually from cache)
+        stems_ready = all([await file_io.exists(path) for path in stems])
+
+        now = time.time()
+        job = {
+            "video_id": str(uuid.uuid4()),
+            "status": JobState.SUBMITTING if stems_ready else JobState.QUEUED,
+            "prompt": preview["prompt"],
+            "image_path": preview["image_path"],
+            "voice_type": preview["voice_type"],
+            "voice_sample_path": preview.get("voice_sample_path"),
+            **full,
+            "seed": preview["seed"],
+            "promoted_from": video_id,
+            "request_key": cache_key("promote", video_id),
+            "user_id": preview.get("user_id"),
+            "tier": preview.get("tier", "free"),
+            "created_at": now,
+            "updated_at": now,
+        }
+        if stems_ready:
+            job.update(
+                voice_path=preview.get("voice_path"),
+                music_path=preview.get("music_path"),
+                render_requested_at=now
+            )
+        return await self._submit(job, dedupe=not force_new)
+
+    def _check_intake(self):
+        if self.queue is None:
+            raise QueueUnavailable("Job queue is not running")
+        if self.draining:
+            raise QueueUnavailable("Server is shutting down, try again shortly")
+        if not self._reserve():
+            raise QueueUnavailable("Job queue is full, try again later")
+
+    def _reserve(self) -> bool:
+        """
+        Hold a queue place until _put, so callers awaiting the job store in
+        between can't overfill the queue; release it with _reserved -= 1
+        """
+        if self.queue.qsize() + self._reserved >= self.max_queue_size:
+            return False
+        self._reserved += 1
+        return True
+
+    async def _submit(self, job: dict, dedupe: bool) -> dict:
+        # Checked before the first await, so a job is only stored once it has a place
+        self._check_intake()
+        try:
+            if dedupe:
+                stored = await self.job_store.put_deduplicated(job)
+                if stored["video_id"] != job["video_id"]:
+                    return {**stored, "deduplicated": True}
+            else:
+                await self.job_store.put(job)
+
+            await self.job_store.claim(job["video_id"], self.owner, self.lease_ttl)
+            self._put(job)
+        finally:
+            self._reserved -= 1
+        await self._publish(job["video_id"], "queued")
+        return {**job, "deduplicated": False}
+
+    def _put(self, job: dict):
+        """
+        Queue a claimed job for the workers
+        Jobs resuming after a render slot or a render go first; new jobs are
+        ordered by start-time fair queuing: each user's next job is tagged one
+        1/weight step after their previous one (or after the current virtual time
+        if they had nothing queued), and the lowest tag runs first
+        """
+        if job["status"] not in (JobState.QUEUED, JobState.GENERATING_AUDIO):
+            self.queue.put_nowait((0, 0.0, next(self._seq), job["video_id"], None))
+            return
+        user = job.get("user_id") or "anonymous"
+        weight = self.scheduler.class_weights.get(job.get("tier"), 1)
+        tag = max(self._virtual_time, self._user_tags.get(user, 0.0)) + 1 / weight
+        self._user_tags[user] = tag
+        self.queue.put_nowait((1, tag, next(self._seq), job["video_id"], user))
+
+    async def _resume(self, video_id: str):
+        """
+        Queue a job that can continue after a wait that doesn't hold a worker
+        Jobs this process can't take now are picked up by a recovery scan
+        """
+        if self.queue is None or self.draining or not self._reserve():
+            return
+        try:
+            job = await self.job_store.claim(video_id, self.owner, self.lease_ttl)
+            if job is not None:
+                self._put(job)
+        finally:
+            self._reserved -= 1
+
+    async def recover(self) -> int:
+        """
+        Claim unfinished jobs that no live worker holds and queue them here
+        Returns the number of jobs claimed
+        """
+        # Rendering jobs belong to the leader's poller, not to a worker
+        statuses = JobState.TRANSITIONS.keys() - JobState.TERMINAL - {JobState.RENDERING}
+
+        claimed = 0
+        for job in await self.job_store.list_claimable(statuses):
+            if job["status"] == JobState.SUBMITTING and not job.get("render_slot") and not job.get("sora_job_id"):
+                # Waiting for the scheduler, which queues it again once it has a slot
+                continue
+            if self.draining or not self._reserve():
+                break
+            try:
+                claimed += await self._recover_job(job["video_id"])
+            finally:
+                self._reserved -= 1
+        return claimed
+
+    async def _recover_job(self, video_id: str) -> int:
+        job = await self.job_store.claim(video_id, self.owner, self.lease_ttl)
+        if job is None:
+            return 0
+
+        # Jobs already accepted by Sora resume from polling instead of resubmitting
+        if job.get("sora_job_id") and job["status"] != JobState.RENDERING and not job.get("video_url"):
+            job = await self.job_store.update(video_id, status=JobState.RENDERING)
+            await self._hand_off_render(job)
+            return 0
+
+        self._put(job)
+        return 1
+
+    async def watch_renders(self):
+        """
+        Leader only: poll every rendering job from this process and hand finished
+        renders back to the workers
+        """
+        for job in await self.job_store.list_by_status([JobState.RENDERING]):
+            self._watch(job)
+
+    def _watch(self, job: dict):
+        video_id = job["video_id"]
+        if video_id in self._watching:
+            return
+        task = asyncio.create_task(self._watch_render(job))
+        self._watching[video_id] = task
+        task.add_done_callback(lambda _, video_id=video_id: self._watching.pop(video_id, None))
+
+    async def stop_watching(self):
+        tasks = list(self._watching.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def events(self, video_id: str, heartbeat: float = 15):
+        """
+        Current job status followed by live progress events until the job finishes
+        Yields None as a heartbeat when nothing happened for a while
+        """
+        # Subscribe before reading the snapshot so no event falls in between
+        async with event_bus.subscribe(video_id) as events:
+            job = await self.job_store.get(video_id)
+            if job is None:
+                yield {"video_id": video_id, "event": "error", "error": "Video job not found"}
+                return
+
+            yield {"video_id": video_id, "event": "status", "status": job["status"]}
+            if job["status"] in JobState.TERMINAL:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                yield event
+                if event["event"] in ("done", "failed"):
+                    return
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    async def _maintain(self):
+        """
+        Keep this process's leases alive, pick up orphaned jobs and, on the
+        leader, keep the render poller in sync with the job store
+        """
+        interval = min(self.recovery_interval, self.lease_ttl / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.job_store.renew_leases(self.owner, self.lease_ttl)
+                await self.recover()
+                if cluster.is_leader:
+                    await self.watch_renders()
+                elif self._watching:
+                    await self.stop_watching()
+            except Exception as e:
+                print(f"Warning: Job maintenance failed: {str(e)}")
+
+    async def _worker(self, worker_id: int):
+        while not self.draining:
+            _, tag, _, video_id, user = await self.queue.get()
+            if user is not None:
+                self._virtual_time = max(self._virtual_time, tag)
+                if self._user_tags.get(user, 0.0) <= self._virtual_time:
+                    # Nothing of theirs left ahead of the virtual clock
+                    self._user_tags.pop(user, None)
+            try:
+                if self.draining:
+                    continue
+                # Skips jobs that are finished or already running in another process
+                job = await self.job_store.claim(video_id, self.owner, self.lease_ttl)
+                if job is None:
+                    continue
+
+                self.running[worker_id] = video_id
+                JOBS_IN_FLIGHT.inc()
+                try:
+                    # Every stage of this job is recorded as a child span of this one
+                    with tracer.span("job", trace_id=video_id, worker=worker_id):
+                        await self._process(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await self._fail(video_id, str(e))
+                finally:
+                    JOBS_IN_FLIGHT.dec()
+            finally:
+                self.running.pop(worker_id, None)
+                self.queue.task_done()
+
+    async def _process(self, job: dict):
+        video_id = job["video_id"]
+
+        if job["status"] in (JobState.QUEUED, JobState.GENERATING_AUDIO):
+            job = await self._transition(job, JobState.GENERATING_AUDIO)
+
+            async def on_stage(name: str, result: Optional[str]):
+                await self._publish(video_id, name, status="completed" if result else "skipped")
+
+            audio = await self.pipeline.prepare_audio(
+                job["prompt"],
+                job["voice_type"],
+                job.get("voice_sample_path"),
+                job.get("audio_duration", job["duration"]),
+                on_stage=on_stage
+            )
+            job = await self._transition(
+                job,
+                JobState.SUBMITTING,
+                voice_path=audio["voice"],
+                music_path=audio["music"],
+                render_requested_at=time.time()
+            )
+
+        if job["status"] == JobState.SUBMITTING:
+            # Render slots are shared by every worker process and handed out by the
+            # scheduler, which queues the job again once it has one
+            if not job.get("render_slot"):
+                await self._publish(video_id, "waiting_for_render", **await self.scheduler.estimate(job))
+                await self.job_store.release_leases(self.owner, [video_id])
+                self.scheduler.wake()
+                return
+            sora_job_id = await self.pipeline.submit_video(
+                prompt=job["prompt"],
+                image_path=job["image_path"],
+                voice_path=job.get("voice_path"),
+                music_path=job.get("music_path"),
+                duration=job["duration"],
+                resolution=job.get("resolution", DEFAULT_RESOLUTION),
+                fps=job.get("fps", DEFAULT_FPS),
+                seed=job.get("seed")
+            )
+            job = await self._transition(job, JobState.RENDERING, sora_job_id=sora_job_id)
+            await self._publish(video_id, "sora_submitted", sora_job_id=sora_job_id)
+
+        if job["status"] == JobState.RENDERING:
+            await self._publish(video_id, "rendering")
+            await self._hand_off_render(job)
+            return
+
+        await self._publish(video_id, "downloading")
+        video_path = await self.pipeline.download_video(job["video_url"], video_id)
+        await self._transition(job, JobState.COMPLETED, video_path=video_path)
+        JOBS_FINISHED.labels(JobState.COMPLETED).inc()
+        await self._publish(video_id, "done")
+
+    async def _watch_render(self, job: dict):
+        video_id = job["video_id"]
+        try:
+            video_url = await self.pipeline.wait_for_video(job["sora_job_id"], job["duration"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._fail(video_id, str(e))
+            return
+
+        job = await self.job_store.get(video_id)
+        if job is None or job["status"] != JobState.RENDERING:
+            return
+        await self._transition(job, JobState.DOWNLOADING, video_url=video_url)
+        self.scheduler.wake()
+        # Otherwise the next recovery scan in any process claims the download
+        await self._resume(video_id)
+
+    async def _hand_off_render(self, job: dict):
+        """
+        Release a rendering job to the leader's poller, which queues it again once rendered
+        """
+        await self.job_store.release_leases(self.owner, [job["video_id"]])
+        if cluster.is_leader:
+            self._watch(job)
+
+    async def _transition(self, job: dict, state: str, **fields) -> dict:
+        if state != job["status"] and state not in JobState.TRANSITIONS[job["status"]]:
+            raise Exception(f"Invalid job transition {job['status']} -> {state}")
+        return await self.job_store.update(job["video_id"], status=state, **fields)
+
+    async def _fail(self, video_id: str, error: str):
+        job = await self.job_store.get(video_id)
+        if job is None or job["status"] in JobState.TERMINAL:
+            return
+        await self.job_store.update(video_id, status=JobState.FAILED, error=error)
+        JOBS_FINISHED.labels(JobState.FAILED).inc()
+        # A failed render frees its slot
+        self.scheduler.wake()
+        await self._publish(video_id, "failed", error=error)
+
+    async def _publish(self, video_id: str, event: str, **data):
+        """
+        Push a progress event to SSE / WebSocket subscribers of this job
+        """
+        try:
+            await event_bus.publish(video_id, {"video_id": video_id, "event": event, **data})
+        except Exception as e:
+            print(f"Warning: Failed to publish {event} event: {str(e)}")
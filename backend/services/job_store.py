@@ -0,0 +1,385 @@
+import os
+import time
+import json
+import asyncio
+from typing import Optional, List, Iterable
+from services.sqlite_db import SQLiteDB
+
+# Only finished jobs are evicted; in-flight jobs are kept regardless of age
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class JobStore:
+    """
+    Base class for video job storage backends
+    Jobs are plain dicts keyed by "video_id" with a "status" field
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("JOB_TTL_SECONDS", 86400))
+        self.sweep_interval = float(os.getenv("JOB_SWEEP_INTERVAL", 300))
+        self._sweeper = None
+
+    async def start(self):
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def get(self, video_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def put(self, job: dict):
+        raise NotImplementedError
+
+    async def update(self, video_id: str, **fields) -> dict:
+        raise NotImplementedError
+
+    async def put_deduplicated(self, job: dict) -> dict:
+        """
+        Store job unless a queued, running or completed job with the same
+        "request_key" already exists; returns whichever job now owns the key
+        Check and insert are atomic, so concurrent duplicates all see one job
+        """
+        raise NotImplementedError
+
+    async def list_by_status(self, statuses: Iterable[str]) -> List[dict]:
+        raise NotImplementedError
+
+    async def claim(self, video_id: str, owner: str, ttl: float) -> Optional[dict]:
+        """
+        Lease an unfinished job to owner for ttl seconds; returns the job, or None if
+        it is finished, missing or leased to another owner that is still alive
+        Re-claiming a job you already hold extends the lease
+        """
+        raise NotImplementedError
+
+    async def list_claimable(self, statuses: Iterable[str]) -> List[dict]:
+        """
+        Jobs in statuses that nobody holds a live lease on
+        """
+        raise NotImplementedError
+
+    async def renew_leases(self, owner: str, ttl: float) -> int:
+        raise NotImplementedError
+
+    async def release_leases(self, owner: str, video_ids: Optional[Iterable[str]] = None):
+        """
+        Give up owner's leases (all of them, or just video_ids) so any worker can claim the jobs
+        """
+        raise NotImplementedError
+
+    async def evict_expired(self) -> int:
+        raise NotImplementedError
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_expired()
+            except Exception as e:
+                print(f"Warning: Job store eviction failed: {str(e)}")
+
+
+class MemoryJobStore(JobStore):
+    """
+    Process-local job store, intended for tests and single-process development
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.jobs = {}
+        self.by_status = {}
+        self.by_request_key = {}
+        self.leases = {}
+
+    async def get(self, video_id: str) -> Optional[dict]:
+        job = self.jobs.get(video_id)
+        return dict(job) if job else None
+
+    async def put(self, job: dict):
+        job = dict(job)
+        job.setdefault("updated_at", time.time())
+        self._unindex(job["video_id"])
+        self.jobs[job["video_id"]] = job
+        self.by_status.setdefault(job["status"], set()).add(job["video_id"])
+        if job.get("request_key"):
+            self.by_request_key.setdefault(job["request_key"], set()).add(job["video_id"])
+
+    async def put_deduplicated(self, job: dict) -> dict:
+        # No awaits between the lookup and the insert, so this is atomic on the event loop
+        candidates = [
+            self.jobs[video_id]
+            for video_id in self.by_request_key.get(job["request_key"], ())
+            if self.jobs[video_id]["status"] != "failed"
+        ]
+        if candidates:
+            return dict(max(candidates, key=lambda j: j["updated_at"]))
+        await self.put(job)
+        return dict(job)
+
+    async def update(self, video_id: str, **fields) -> dict:
+        if video_id not in self.jobs:
+            raise Exception("Video job not found")
+        job = dict(self.jobs[video_id])
+        job.update(fields)
+        job["updated_at"] = time.time()
+        await self.put(job)
+        return dict(job)
+
+    async def list_by_status(self, statuses: Iterable[str]) -> List[dict]:
+        return [
+            dict(self.jobs[video_id])
+            for status in statuses
+            for video_id in self.by_status.get(status, ())
+        ]
+
+    async def claim(self, video_id: str, owner: str, ttl: float) -> Optional[dict]:
+        job = self.jobs.get(video_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return None
+        now = time.time()
+        holder, expires_at = self.leases.get(video_id, (None, 0))
+        if holder not in (None, owner) and expires_at >= now:
+            return None
+        self.leases[video_id] = (owner, now + ttl)
+        return dict(job)
+
+    async def list_claimable(self, statuses: Iterable[str]) -> List[dict]:
+        now = time.time()
+        return [
+            job for job in await self.list_by_status(statuses)
+            if self.leases.get(job["video_id"], (None, 0))[1] < now
+        ]
+
+    async def renew_leases(self, owner: str, ttl: float) -> int:
+        held = [
+            video_id for video_id, (holder, _) in self.leases.items()
+            if holder == owner and self.jobs[video_id]["status"] not in TERMINAL_STATUSES
+        ]
+        for video_id in held:
+            self.leases[video_id] = (owner, time.time() + ttl)
+        return len(held)
+
+    async def release_leases(self, owner: str, video_ids: Optional[Iterable[str]] = None):
+        video_ids = list(self.leases) if video_ids is None else list(video_ids)
+        for video_id in video_ids:
+            if self.leases.get(video_id, (None, 0))[0] == owner:
+                del self.leases[video_id]
+
+    async def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl
+        expired = [
+            video_id
+            for status in TERMINAL_STATUSES
+            for video_id in self.by_status.get(status, ())
+            if self.jobs[video_id]["updated_at"] < cutoff
+        ]
+        for video_id in expired:
+            self._unindex(video_id)
+            del self.jobs[video_id]
+            self.leases.pop(video_id, None)
+        return len(expired)
+
+    def _unindex(self, video_id: str):
+        old = self.jobs.get(video_id)
+        if old:
+            self.by_status.get(old["status"], set()).discard(video_id)
+            if old.get("request_key"):
+                self.by_request_key.get(old["request_key"], set()).discard(video_id)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite-backed job store in WAL mode, shared by every worker process on the host
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.db = SQLiteDB(path, synchronous="NORMAL")
+        self.db.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                video_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        columns = [row[1] for row in self.db.conn.execute("PRAGMA table_info(jobs)")]
+        for column, kind in (("request_key", "TEXT"), ("lease_owner", "TEXT"), ("lease_expires_at", "REAL")):
+            if column not in columns:
+                self.db.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self.db.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at)")
+        self.db.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_request_key ON jobs (request_key)")
+        self.db.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease_owner ON jobs (lease_owner)")
+
+    async def get(self, video_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, video_id)
+
+    async def put(self, job: dict):
+        await asyncio.to_thread(self._put, job)
+
+    async def update(self, video_id: str, **fields) -> dict:
+        return await asyncio.to_thread(self._update, video_id, fields)
+
+    async def put_deduplicated(self, job: dict) -> dict:
+        return await asyncio.to_thread(self._put_deduplicated, job)
+
+    async def list_by_status(self, statuses: Iterable[str]) -> List[dict]:
+        return await asyncio.to_thread(self._list_by_status, list(statuses))
+
+    async def claim(self, video_id: str, owner: str, ttl: float) -> Optional[dict]:
+        return await asyncio.to_thread(self._claim, video_id, owner, ttl)
+
+    async def list_claimable(self, statuses: Iterable[str]) -> List[dict]:
+        return await asyncio.to_thread(self._list_claimable, list(statuses))
+
+    async def renew_leases(self, owner: str, ttl: float) -> int:
+        return await asyncio.to_thread(self._renew_leases, owner, ttl)
+
+    async def release_leases(self, owner: str, video_ids: Optional[Iterable[str]] = None):
+        await asyncio.to_thread(self._release_leases, owner, None if video_ids is None else list(video_ids))
+
+    async def evict_expired(self) -> int:
+        return await asyncio.to_thread(self._evict_expired)
+
+    def _get(self, video_id: str) -> Optional[dict]:
+        with self.db.lock:
+            row = self.db.conn.execute(
+                "SELECT data FROM jobs WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, job: dict):
+        with self.db.lock:
+            self._insert(job)
+
+    def _insert(self, job: dict):
+        job = dict(job)
+        job.setdefault("updated_at", time.time())
+        self.db.conn.execute(
+            "INSERT OR REPLACE INTO jobs (video_id, status, data, updated_at, request_key) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job["video_id"], job["status"], json.dumps(job), job["updated_at"], job.get("request_key"))
+        )
+
+    def _put_deduplicated(self, job: dict) -> dict:
+        # The write lock makes lookup + insert atomic across worker processes too
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT data FROM jobs WHERE request_key = ? AND status != 'failed' "
+                "ORDER BY updated_at DESC LIMIT 1",
+                (job["request_key"],)
+            ).fetchone()
+            if row is None:
+                self._insert(job)
+        return json.loads(row[0]) if row else dict(job)
+
+    def _update(self, video_id: str, fields: dict) -> dict:
+        # Read-modify-write inside one write transaction so other processes can't interleave
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT data FROM jobs WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None:
+                raise Exception("Video job not found")
+            job = json.loads(row[0])
+            job.update(fields)
+            job["updated_at"] = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE video_id = ?",
+                (job["status"], json.dumps(job), job["updated_at"], video_id)
+            )
+        return job
+
+    def _list_by_status(self, statuses: List[str]) -> List[dict]:
+        if not statuses:
+            return []
+        placeholders = ",".join("?" for _ in statuses)
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                f"SELECT data FROM jobs WHERE status IN ({placeholders})", statuses
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _claim(self, video_id: str, owner: str, ttl: float) -> Optional[dict]:
+        now = time.time()
+        placeholders = ",".join("?" for _ in TERMINAL_STATUSES)
+        with self.db.lock:
+            # A single conditional UPDATE, so two workers can never both win the lease
+            cursor = self.db.conn.execute(
+                f"UPDATE jobs SET lease_owner = ?, lease_expires_at = ? "
+                f"WHERE video_id = ? AND status NOT IN ({placeholders}) "
+                f"AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires_at < ?)",
+                (owner, now + ttl, video_id, *TERMINAL_STATUSES, owner, now)
+            )
+            if cursor.rowcount == 0:
+                return None
+            row = self.db.conn.execute(
+                "SELECT data FROM jobs WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _list_claimable(self, statuses: List[str]) -> List[dict]:
+        if not statuses:
+            return []
+        placeholders = ",".join("?" for _ in statuses)
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                f"SELECT data FROM jobs WHERE status IN ({placeholders}) "
+                f"AND (lease_owner IS NULL OR lease_expires_at < ?) ORDER BY updated_at",
+                (*statuses, time.time())
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _renew_leases(self, owner: str, ttl: float) -> int:
+        placeholders = ",".join("?" for _ in TERMINAL_STATUSES)
+        with self.db.lock:
+            cursor = self.db.conn.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE lease_owner = ? AND status NOT IN ({placeholders})",
+                (time.time() + ttl, owner, *TERMINAL_STATUSES)
+            )
+        return cursor.rowcount
+
+    def _release_leases(self, owner: str, video_ids: Optional[List[str]]):
+        with self.db.lock:
+            if video_ids is None:
+                self.db.conn.execute(
+                    "UPDATE jobs SET lease_owner = NULL, lease_expires_at = NULL WHERE lease_owner = ?",
+                    (owner,)
+                )
+                return
+            self.db.conn.executemany(
+                "UPDATE jobs SET lease_owner = NULL, lease_expires_at = NULL "
+                "WHERE video_id = ? AND lease_owner = ?",
+                [(video_id, owner) for video_id in video_ids]
+            )
+
+    def _evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl
+        placeholders = ",".join("?" for _ in TERMINAL_STATUSES)
+        with self.db.lock:
+            cursor = self.db.conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*TERMINAL_STATUSES, cutoff)
+            )
+        return cursor.rowcount
+
+
+def create_job_store() -> JobStore:
+    """
+    Build the job store configured through JOB_STORE_BACKEND ("sqlite" or "memory")
+    """
+    backend = os.getenv("JOB_STORE_BACKEND", "sqlite")
+
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "data/jobs.db"))
+
+    raise Exception(f"Unknown job store backend: {backend}")
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Callable, List
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Stages range from sub-second cache hits to multi-minute Sora renders
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300, 600, 900, 1800)
+
+STAGE_SECONDS = Histogram(
+    "relai_stage_duration_seconds",
+    "Time spent in each pipeline stage",
+    ["stage", "outcome"],
+    buckets=STAGE_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "relai_http_request_duration_seconds",
+    "API request latency until the response starts",
+    ["method", "route", "status"]
+)
+JOBS_IN_FLIGHT = Gauge(
+    "relai_jobs_in_flight",
+    "Video jobs currently being processed by a worker",
+    multiprocess_mode="livesum"
+)
+JOBS_FINISHED = Counter("relai_jobs_finished_total", "Video jobs that reached a terminal state", ["status"])
+BYTES_WRITTEN = Counter("relai_bytes_written_total", "Bytes written to local disk", ["kind"])
+EVENT_LOOP_LAG = Histogram(
+    "relai_event_loop_lag_seconds",
+    "How late the event loop ran a timer scheduled on a fixed interval",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+_current_span: ContextVar[Optional[dict]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Lightweight per-job trace spans
+    A job's root span uses the video id as trace id; stages started inside it
+    (including in tasks it spawns) become its children
+    With several worker processes a job's stages run in different processes, so
+    spans are also written to a shared store (the cluster database) in the background
+    """
+
+    def __init__(self):
+        self.max_traces = int(os.getenv("TRACE_MAX_JOBS", 1000))
+        self.log_spans = os.getenv("TRACE_LOG", "false").lower() == "true"
+        self.store = None
+        self._traces = OrderedDict()
+        self._pending = []
+        self._flusher = None
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes):
+        parent = _current_span.get()
+        trace_id = trace_id or (parent["trace_id"] if parent else None)
+        if trace_id is None:
+            # Not part of a job (e.g. a suggestions request): nothing to attach to
+            yield None
+            return
+
+        span = {
+            "trace_id": trace_id,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent["span_id"] if parent and parent["trace_id"] == trace_id else None,
+            "name": name,
+            "start": time.time(),
+            "attributes": attributes,
+        }
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+            span["status"] = "ok"
+        except BaseException as e:
+            span["status"] = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            span["error"] = str(e)
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - started
+            _current_span.reset(token)
+            self._record(span)
+
+    async def get(self, trace_id: str) -> List[dict]:
+        spans = {span["span_id"]: span for span in self._traces.get(trace_id, ())}
+        if self.store is not None:
+            for span in await self.store.get_spans(trace_id):
+                spans.setdefault(span["span_id"], span)
+        return sorted(spans.values(), key=lambda s: s["start"])
+
+    def _record(self, span: dict):
+        spans = self._traces.setdefault(span["trace_id"], [])
+        spans.append(span)
+        self._traces.move_to_end(span["trace_id"])
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+
+        if self.log_spans:
+            print(json.dumps({"type": "span", **span}, default=str))
+
+        if self.store is not None:
+            self._pending.append(span)
+            if self._flusher is None:
+                self._flusher = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                await self.store.add_spans(batch)
+        except Exception as e:
+            print(f"Warning: Failed to store trace spans: {str(e)}")
+        finally:
+            self._flusher = None
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """
+    Time a stage into the latency histogram and record it as a span of the current job
+    """
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        with tracer.span(name, **attributes) as span:
+            yield span
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        STAGE_SECONDS.labels(name, outcome).observe(time.perf_counter() - started)
+
+
+def observe_stage(name: str, seconds: float, outcome: str = "ok"):
+    """
+    Record a duration measured by hand, for stages that don't fit a with block
+    """
+    STAGE_SECONDS.labels(name, outcome).observe(seconds)
+
+
+def record_bytes_written(kind: str, size: int):
+    BYTES_WRITTEN.labels(kind).inc(size)
+
+
+class EventLoopMonitor:
+    """
+    Measures event-loop lag: how much later than scheduled a periodic wakeup actually runs
+    Lag means something is blocking the loop (CPU work or sync I/O on the hot path)
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.5))
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            EVENT_LOOP_LAG.observe(self.last_lag)
+
+
+loop_monitor = EventLoopMonitor()
+
+
+class RuntimeCollector:
+    """
+    Exports state other components already track (queue depth, provider guards, HTTP pool)
+    Read at scrape time so the hot path doesn't pay for it
+    """
+
+    def __init__(self):
+        self._gauges = []
+        self._providers: Optional[Callable[[], dict]] = None
+        self._http_pool: Optional[Callable[[], dict]] = None
+
+    def add_gauge(self, name: str, documentation: str, read: Callable[[], float]):
+        self._gauges.append((name, documentation, read))
+
+    def set_providers(self, read: Callable[[], dict]):
+        self._providers = read
+
+    def set_http_pool(self, read: Callable[[], dict]):
+        self._http_pool = read
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "relai_event_loop_lag_last_seconds", "Most recent event-loop lag sample"
+        )
+        gauge.add_metric([], loop_monitor.last_lag)
+        yield gauge
+
+        gauge = GaugeMetricFamily(
+            "relai_event_loop_lag_max_seconds", "Largest event-loop lag seen since startup"
+        )
+        gauge.add_metric([], loop_monitor.max_lag)
+        yield gauge
+
+        for name, documentation, read in self._gauges:
+            gauge = GaugeMetricFamily(name, documentation)
+            gauge.add_metric([], read())
+            yield gauge
+
+        if self._providers:
+            yield from self._collect_providers(self._providers())
+        if self._http_pool:
+            yield from self._collect_http_pool(self._http_pool())
+
+    def _collect_providers(self, providers: dict):
+        counters = {
+            "calls": "Provider calls made through the resilience layer",
+            "successes": "Provider calls that succeeded",
+            "failures": "Provider attempts that failed with a retryable error",
+            "retries": "Provider call retries",
+            "retries_denied": "Retries refused by the retry budget",
+            "rejected": "Provider calls rejected by an open circuit breaker",
+        }
+        for stat, documentation in counters.items():
+            family = CounterMetricFamily(f"relai_provider_{stat}", documentation, labels=["provider"])
+            for provider, metrics in providers.items():
+                family.add_metric([provider], metrics[stat])
+            yield family
+
+        in_flight = GaugeMetricFamily(
+            "relai_provider_in_flight", "Provider requests in flight", labels=["provider"]
+        )
+        breaker = GaugeMetricFamily(
+            "relai_provider_circuit_state", "1 for the breaker's current state", labels=["provider", "state"]
+        )
+        for provider, metrics in providers.items():
+            in_flight.add_metric([provider], metrics["in_flight"])
+            for state in ("closed", "open", "half_open"):
+                breaker.add_metric([provider, state], 1 if metrics["breaker_state"] == state else 0)
+        yield in_flight
+        yield breaker
+
+    def _collect_http_pool(self, pool: dict):
+        for stat in ("requests_total", "errors_total"):
+            family = CounterMetricFamily(f"relai_http_client_{stat[:-len('_total')]}", f"Outbound HTTP {stat}")
+            family.add_metric([], pool[stat])
+            yield family
+        for stat in ("open_connections", "idle_connections"):
+            family = GaugeMetricFamily(f"relai_http_client_{stat}", f"Outbound HTTP pool {stat.replace('_', ' ')}")
+            family.add_metric([], pool[stat])
+            yield family
+
+
+runtime_collector = RuntimeCollector()
+REGISTRY.register(runtime_collector)
+
+
+def scrape_registry() -> CollectorRegistry:
+    """
+    Registry for /metrics
+    With PROMETHEUS_MULTIPROC_DIR set (several worker processes) counters, histograms
+    and gauges are merged from every process's files; the runtime gauges are read
+    from the process serving the scrape
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(runtime_collector)
+    return registry
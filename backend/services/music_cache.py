@@ -0,0 +1,56 @@
+import os
+import random
+from pathlib import Path
+from typing import Optional, List
+from services.cache_utils import cache_key, touch, evict_lru
+from services.file_io import file_io
+
+
+class MusicCache:
+    """
+    Content-addressed store of generated tracks
+    Each (music prompt, duration, style) key keeps a pool of up to N variants
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.variants_per_key = int(os.getenv("MUSIC_CACHE_VARIANTS", 3))
+        self.max_bytes = int(os.getenv("MUSIC_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+    def key(self, music_prompt: str, duration: int, style: str) -> str:
+        return cache_key("music", music_prompt, duration, style)
+
+    def variants(self, key: str) -> List[Path]:
+        key_dir = self.root / key
+        if not key_dir.exists():
+            return []
+        return sorted(key_dir.glob("*.mp3"))
+
+    async def get(self, key: str) -> Optional[Path]:
+        """
+        Pick a random cached variant for the key, or None on a miss
+        """
+        return await file_io.run(self._get, key)
+
+    async def needs_variants(self, key: str) -> bool:
+        return len(await file_io.run(self.variants, key)) < self.variants_per_key
+
+    async def new_variant_path(self, key: str) -> Path:
+        key_dir = self.root / key
+        await file_io.run(key_dir.mkdir, parents=True, exist_ok=True)
+        return key_dir / f"{os.urandom(8).hex()}.mp3"
+
+    async def enforce_quota(self) -> int:
+        """
+        Evict least recently used variants until the cache fits its disk quota
+        """
+        return await file_io.run(evict_lru, self.root, self.max_bytes, "*/*.mp3")
+
+    def _get(self, key: str) -> Optional[Path]:
+        variants = self.variants(key)
+        if not variants:
+            return None
+        path = random.choice(variants)
+        touch(path)
+        return path
@@ -4,58 +4,102 @@ import httpx
 import asyncio
 from pathlib import Path
 from typing import Optional
+from services.http_pool import http_pool
+from services.downloads import download_file
+from services.music_cache import MusicCache
+from services.cache_utils import SingleFlight, link_or_copy
+from services.poller_service import poller
+from services.resilience import resilience, ProviderError, CircuitOpenError
+from services import metrics
+from services.file_io import file_io
+from services.prompt_classifier import prompt_classifier
+from services.cluster import cluster
+
+# Fixed music prompts per content category
+MUSIC_PROMPTS = {
+    "gym": "Energetic upbeat electronic gym workout music, motivational, powerful beats, 128 BPM, modern EDM style",
+    "luxury": "Smooth modern hip-hop beat, luxury lifestyle vibes, clean production, laid-back but confident",
+    "tutorial": "Light corporate background music, clean and professional, subtle melody, not distracting",
+    "comedy": "Playful upbeat music, fun and quirky, lighthearted melody, modern pop elements",
+    "inspirational": "Inspirational uplifting music, emotional but powerful, modern cinematic elements, building progression",
+    "default": "Modern versatile background music, clean production, energetic but not overpowering, perfect for social media",
+}
+
+MUSIC_STYLE = "modern"
+
 
 class MusicService:
     def __init__(self):
         self.api_key = os.getenv("SUNO_API_KEY")
-        self.base_url = "https://api.suno.ai/v1"
+        self.base_url = os.getenv("SUNO_BASE_URL", "https://api.suno.ai/v1")
+        self.guard = resilience.guard("suno")
+        self.expected_generation_time = float(os.getenv("SUNO_EXPECTED_SECONDS", 45))
+        # Suno posts completion callbacks here when a public URL is configured
+        public_url = os.getenv("PUBLIC_BASE_URL")
+        self.callback_url = f"{public_url.rstrip('/')}/api/webhooks/suno" if public_url else None
         self.output_dir = Path("uploads/music")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = MusicCache(self.output_dir / "cache")
+        self.single_flight = SingleFlight()
+        self.prewarm_enabled = os.getenv("MUSIC_CACHE_PREWARM", "true").lower() == "true"
+        self.prewarm_durations = [
+            int(d) for d in os.getenv("MUSIC_CACHE_PREWARM_DURATIONS", "30").split(",") if d
+        ]
+        self._background = set()
+
+    async def start(self):
+        """
+        Pre-warm the music cache in the background (once per server, from the leader)
+        """
+        if self.prewarm_enabled and self.api_key and cluster.is_leader:
+            self._spawn(self.prewarm())
+
+    async def stop(self):
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def prewarm(self):
+        """
+        Fill every (prompt, duration) variant pool, one generation at a time
+        """
+        for music_prompt in MUSIC_PROMPTS.values():
+            for duration in self.prewarm_durations:
+                key = self.cache.key(music_prompt, duration, MUSIC_STYLE)
+                while await self.cache.needs_variants(key):
+                    try:
+                        await self._generate_variant(key, music_prompt, duration)
+                    except Exception as e:
+                        print(f"Warning: Music pre-warm failed: {str(e)}")
+                        return
 
     async def generate_music(self, video_prompt: str, duration: int = 30) -> str:
         """
         Generate background music using Suno AI based on video context
+        Served from the variant cache when possible; a miss generates a new track
         Falls back to a music generation prompt if Suno is not available
         """
         try:
             # Determine music style from video prompt
             music_prompt = self._create_music_prompt(video_prompt)
+            key = self.cache.key(music_prompt, duration, MUSIC_STYLE)
 
-            # Generate music with Suno AI
-            music_id = str(uuid.uuid4())
-            music_path = self.output_dir / f"music_{music_id}.mp3"
-
-            # Call Suno API (using httpx for async)
-            async with httpx.AsyncClient() as client:
-                # Generate music
-                response = await client.post(
-                    f"{self.base_url}/generate",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "prompt": music_prompt,
-                        "duration": duration,
-                        "instrumental": True,  # No lyrics, just background music
-                        "style": "modern"
-                    },
-                    timeout=60.0
+            cached_path = await self.cache.get(key)
+            if cached_path is None:
+                # Concurrent misses for the same key share one Suno generation
+                cached_path = await self.single_flight.do(
+                    key, lambda: self._generate_variant(key, music_prompt, duration)
                 )
+            elif not self.single_flight.in_flight(key) and await self.cache.needs_variants(key):
+                # Grow the variant pool in the background
+                self._spawn(self.single_flight.do(
+                    key, lambda: self._generate_variant(key, music_prompt, duration)
+                ))
 
-                if response.status_code != 200:
-                    raise Exception(f"Suno API error: {response.text}")
-
-                result = response.json()
-                generation_id = result["id"]
-
-                # Poll for completion
-                music_url = await self._wait_for_music(client, generation_id)
-
-                # Download music
-                download_response = await client.get(music_url)
-                with open(music_path, "wb") as f:
-                    f.write(download_response.content)
+            # Give the job its own link so cache eviction can't remove the file
+            music_id = str(uuid.uuid4())
+            music_path = self.output_dir / f"music_{music_id}.mp3"
+            await file_io.run(link_or_copy, cached_path, music_path)
 
             return str(music_path)
 
@@ -65,61 +109,107 @@ class MusicService:
             # Return None to indicate no music (Sora can still generate the video)
             return None
 
+    async def _generate_variant(self, key: str, music_prompt: str, duration: int) -> Path:
+        """
+        Generate a new track with Suno AI and add it to the cache
+        """
+        with metrics.stage("music_generation"):
+            variant_path = await self.cache.new_variant_path(key)
+
+            # Call Suno API over the shared connection pool
+            client = http_pool.client
+
+            # Generate music
+            payload = {
+                "prompt": music_prompt,
+                "duration": duration,
+                "instrumental": True,  # No lyrics, just background music
+                "style": MUSIC_STYLE
+            }
+            if self.callback_url:
+                payload["callback_url"] = self.callback_url
+
+            result = await self.guard.call(self._submit, client, payload, idempotent=False)
+            generation_id = result["id"]
+
+            # Poll for completion
+            music_url = await self._wait_for_music(client, generation_id)
+
+            # Download music
+            downloaded = await download_file(music_url, variant_path)
+            metrics.record_bytes_written("music", downloaded["size"])
+            await self.cache.enforce_quota()
+
+            return variant_path
+
+    async def _submit(self, client: httpx.AsyncClient, payload: dict) -> dict:
+        response = await client.post(
+            f"{self.base_url}/generate",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json=payload,
+            timeout=60.0
+        )
+
+        if response.status_code != 200:
+            raise ProviderError(f"Suno API error: {response.text}", response)
+
+        return response.json()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"Warning: Background music generation failed: {str(task.exception())}")
+
     async def _wait_for_music(self, client: httpx.AsyncClient, generation_id: str, max_wait: int = 120) -> str:
         """
         Wait for music generation to complete
+        Status checks are scheduled by the shared poller (or triggered by the Suno callback)
         """
-        start_time = asyncio.get_event_loop().time()
-
-        while True:
-            response = await client.get(
-                f"{self.base_url}/generate/{generation_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            )
+        return await poller.wait(
+            f"suno:{generation_id}",
+            lambda: self._check_music(client, generation_id),
+            expected_duration=self.expected_generation_time,
+            timeout=max_wait,
+            webhook=self.callback_url is not None
+        )
+
+    async def _check_music(self, client: httpx.AsyncClient, generation_id: str) -> Optional[str]:
+        try:
+            result = await self.guard.call(self._get_status, client, generation_id)
+        except CircuitOpenError:
+            # Check again on the next poll
+            return None
 
-            if response.status_code != 200:
-                raise Exception("Failed to check music status")
+        if result["status"] == "completed":
+            return result["audio_url"]
 
-            result = response.json()
+        if result["status"] == "failed":
+            raise Exception("Music generation failed")
 
-            if result["status"] == "completed":
-                return result["audio_url"]
+        return None
 
-            if result["status"] == "failed":
-                raise Exception("Music generation failed")
+    async def _get_status(self, client: httpx.AsyncClient, generation_id: str) -> dict:
+        response = await client.get(
+            f"{self.base_url}/generate/{generation_id}",
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
 
-            # Check timeout
-            if asyncio.get_event_loop().time() - start_time > max_wait:
-                raise Exception("Music generation timeout")
+        if response.status_code != 200:
+            raise ProviderError("Failed to check music status", response)
 
-            await asyncio.sleep(3)
+        return response.json()
 
     def _create_music_prompt(self, video_prompt: str) -> str:
         """
         Create an appropriate music prompt based on video content
+        Categories and their keywords live in prompt_keywords.json
         """
-        prompt_lower = video_prompt.lower()
-
-        # Gym/Workout content
-        if any(word in prompt_lower for word in ["gym", "workout", "exercise", "fitness", "training"]):
-            return "Energetic upbeat electronic gym workout music, motivational, powerful beats, 128 BPM, modern EDM style"
-
-        # Luxury/Lifestyle content
-        elif any(word in prompt_lower for word in ["luxury", "miami", "beach", "lifestyle"]):
-            return "Smooth modern hip-hop beat, luxury lifestyle vibes, clean production, laid-back but confident"
-
-        # Tutorial/Educational content
-        elif any(word in prompt_lower for word in ["tutorial", "how to", "guide", "learn", "explain"]):
-            return "Light corporate background music, clean and professional, subtle melody, not distracting"
-
-        # Comedy/Fun content
-        elif any(word in prompt_lower for word in ["funny", "comedy", "joke", "fun"]):
-            return "Playful upbeat music, fun and quirky, lighthearted melody, modern pop elements"
-
-        # Inspirational content
-        elif any(word in prompt_lower for word in ["inspire", "motivation", "success", "dream"]):
-            return "Inspirational uplifting music, emotional but powerful, modern cinematic elements, building progression"
-
-        # Default - versatile background music
-        else:
-            return "Modern versatile background music, clean production, energetic but not overpowering, perfect for social media"
+        return MUSIC_PROMPTS[prompt_classifier.classify("music", video_prompt)]
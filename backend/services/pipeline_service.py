@@ -0,0 +1,186 @@
+import os
+import random
+import asyncio
+from typing import Optional, Awaitable, Callable
+from services.resilience import resilience
+from services.sora_service import DEFAULT_RESOLUTION, DEFAULT_FPS
+from services import metrics
+
+
+class PipelineStage:
+    def __init__(
+        self,
+        name: str,
+        coro: Awaitable,
+        timeout: float,
+        required: bool = True,
+        provider: Optional[str] = None
+    ):
+        self.name = name
+        self.coro = coro
+        self.timeout = timeout
+        self.required = required
+        self.provider = provider
+
+
+class VideoPipeline:
+    def __init__(self, sora_service, voice_service, music_service):
+        self.sora_service = sora_service
+        self.voice_service = voice_service
+        self.music_service = music_service
+
+        # Per-stage deadlines (seconds)
+        self.music_timeout = float(os.getenv("MUSIC_STAGE_TIMEOUT", 150))
+        self.voice_timeout = float(os.getenv("VOICE_STAGE_TIMEOUT", 60))
+        self.sora_submit_timeout = float(os.getenv("SORA_SUBMIT_TIMEOUT", 120))
+
+        # Preview renders: a short low-resolution clip to check a prompt before paying for the full render
+        self.preview_duration = int(os.getenv("PREVIEW_DURATION", 4))
+        self.preview_resolution = os.getenv("PREVIEW_RESOLUTION", "480p")
+        self.preview_fps = int(os.getenv("PREVIEW_FPS", 24))
+
+        # Per-provider job slots, held for a whole stage
+        # (individual API requests are limited separately by the resilience layer)
+        self.limits = {
+            "suno": asyncio.Semaphore(int(os.getenv("SUNO_CONCURRENCY", 4))),
+            "elevenlabs": asyncio.Semaphore(int(os.getenv("ELEVENLABS_CONCURRENCY", 4))),
+        }
+
+    def limit(self, provider: str) -> asyncio.Semaphore:
+        return self.limits[provider]
+
+    def render_settings(self, duration: int, preview: bool = False) -> dict:
+        """
+        Sora settings for a new job
+        Audio is always prepared for the full duration, so a preview's stems can be
+        reused as-is when it is promoted; the seed is fixed for the same reason
+        """
+        settings = {
+            "duration": duration,
+            "audio_duration": duration,
+            "resolution": DEFAULT_RESOLUTION,
+            "fps": DEFAULT_FPS,
+            "seed": random.randint(0, 2 ** 31 - 1),
+            "preview": preview,
+        }
+        if preview:
+            settings.update(
+                duration=min(duration, self.preview_duration),
+                resolution=self.preview_resolution,
+                fps=self.preview_fps
+            )
+        return settings
+
+    async def prepare_audio(
+        self,
+        prompt: str,
+        voice_type: str = "ai",
+        voice_sample_path: Optional[str] = None,
+        duration: int = 30,
+        on_stage: Optional[Callable[[str, Optional[str]], Awaitable]] = None
+    ) -> dict:
+        """
+        Fan out the audio stages and collect their results
+        Music is optional: if it misses its deadline the video is rendered without it,
+        and while Suno's circuit breaker is open it is skipped without waiting
+        on_stage(name, result) is awaited as each stage finishes
+        """
+        stages = []
+
+        if resilience.guard("suno").available():
+            stages.append(PipelineStage(
+                "music",
+                self.music_service.generate_music(prompt, duration),
+                self.music_timeout,
+                required=False,
+                provider="suno"
+            ))
+        else:
+            print("Warning: Suno is unavailable, skipping music")
+            if on_stage:
+                await on_stage("music", None)
+
+        if voice_type == "ai":
+            stages.append(PipelineStage(
+                "voice",
+                self.voice_service.generate_voice(prompt),
+                self.voice_timeout,
+                provider="elevenlabs"
+            ))
+        elif voice_type == "custom" and voice_sample_path:
+            stages.append(PipelineStage(
+                "voice",
+                self.voice_service.clone_voice(voice_sample_path, prompt),
+                self.voice_timeout,
+                provider="elevenlabs"
+            ))
+
+        results = await self.run_stages(stages, on_stage)
+
+        return {
+            "music": results.get("music"),
+            "voice": results.get("voice")
+        }
+
+    async def run_stages(self, stages: list, on_stage: Optional[Callable] = None) -> dict:
+        """
+        Run independent stages concurrently, each bounded by its own deadline
+        A failing required stage cancels the remaining ones; optional stages resolve to None
+        """
+        tasks = {
+            asyncio.create_task(self._run_stage(stage)): stage
+            for stage in stages
+        }
+        results = {}
+
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task].name
+                    results[name] = task.result()
+                    if on_stage:
+                        await on_stage(name, results[name])
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        return results
+
+    async def submit_video(self, **kwargs) -> str:
+        """
+        Submit the render to Sora, bounded by the submission deadline
+        """
+        with metrics.stage("sora_submit"):
+            return await asyncio.wait_for(
+                self.sora_service.submit_video(**kwargs),
+                timeout=self.sora_submit_timeout
+            )
+
+    async def wait_for_video(self, sora_job_id: str, duration: int = 30) -> str:
+        with metrics.stage("sora_render", sora_job_id=sora_job_id):
+            return await self.sora_service.wait_for_video(sora_job_id, duration)
+
+    async def download_video(self, video_url: str, video_id: str) -> str:
+        with metrics.stage("download"):
+            return await self.sora_service.download_video(video_url, video_id)
+
+    async def _run_stage(self, stage: PipelineStage):
+        try:
+            with metrics.stage(stage.name):
+                if stage.provider:
+                    async with self.limits[stage.provider]:
+                        return await asyncio.wait_for(stage.coro, timeout=stage.timeout)
+                return await asyncio.wait_for(stage.coro, timeout=stage.timeout)
+        except asyncio.TimeoutError:
+            if stage.required:
+                raise Exception(f"{stage.name} stage timed out after {stage.timeout:.0f}s")
+            print(f"Warning: {stage.name} stage timed out, continuing without it")
+            return None
+        except Exception as e:
+            if stage.required:
+                raise
+            print(f"Warning: {stage.name} stage failed: {str(e)}")
+            return None
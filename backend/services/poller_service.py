@@ -0,0 +1,191 @@
+import os
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+class PollTarget:
+    def __init__(
+        self,
+        key: str,
+        check: Callable[[], Awaitable],
+        expected_duration: float,
+        timeout: Optional[float],
+        webhook: bool,
+        now: float
+    ):
+        self.key = key
+        self.check = check
+        self.expected_duration = expected_duration
+        self.started_at = now
+        self.deadline = now + timeout if timeout else None
+        self.webhook = webhook
+        self.attempts = 0
+        self.overdue_checks = 0
+        self.checking = False
+        self.next_check_at = now
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class PollerService:
+    """
+    Single shared poller for every outstanding provider job
+    Each target is checked on an adaptive, jittered schedule derived from its
+    expected completion time instead of a fixed per-job sleep loop
+    """
+
+    def __init__(self):
+        self.min_interval = float(os.getenv("POLLER_MIN_INTERVAL", 2))
+        self.max_interval = float(os.getenv("POLLER_MAX_INTERVAL", 60))
+        self.webhook_interval = float(os.getenv("POLLER_WEBHOOK_INTERVAL", 120))
+        self.max_concurrent_checks = int(os.getenv("POLLER_MAX_CONCURRENT_CHECKS", 16))
+        self.jitter = float(os.getenv("POLLER_JITTER", 0.2))
+        self._targets = {}
+        self._wakeup = asyncio.Event()
+        self._semaphore = None
+        self._task = None
+        self._checks = set()
+        self.stats = {"checks_total": 0, "webhooks_total": 0}
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_checks)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def wait(
+        self,
+        key: str,
+        check: Callable[[], Awaitable],
+        expected_duration: float,
+        timeout: Optional[float] = None,
+        webhook: bool = False
+    ):
+        """
+        Register a job and wait until its check returns a result
+        check() returns None while the job is pending, a value once it is done,
+        and raises if the job failed
+        """
+        target = self._targets.get(key)
+        if target is None:
+            target = PollTarget(
+                key, check, expected_duration, timeout, webhook,
+                asyncio.get_running_loop().time()
+            )
+            # First check once a fraction of the expected time has passed
+            target.next_check_at += self._first_interval(target)
+            self._targets[key] = target
+            self._wakeup.set()
+
+        return await asyncio.shield(target.future)
+
+    def notify(self, key: str) -> bool:
+        """
+        Completion callback from a webhook: check the job right away
+        """
+        target = self._targets.get(key)
+        if target is None:
+            return False
+        self.stats["webhooks_total"] += 1
+        target.next_check_at = asyncio.get_running_loop().time()
+        self._wakeup.set()
+        return True
+
+    def pending(self) -> int:
+        return len(self._targets)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            next_wake = now + self.max_interval
+
+            for target in list(self._targets.values()):
+                if target.checking:
+                    continue
+                if target.next_check_at <= now:
+                    target.checking = True
+                    task = asyncio.create_task(self._check(target))
+                    self._checks.add(task)
+                    task.add_done_callback(self._checks.discard)
+                else:
+                    next_wake = min(next_wake, target.next_check_at)
+
+            # Sleep until the next target is due or something wakes us up
+            self._wakeup.clear()
+            timer = loop.call_later(max(0, next_wake - now), self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                timer.cancel()
+
+    async def _check(self, target: PollTarget):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                self.stats["checks_total"] += 1
+                target.attempts += 1
+                result = await target.check()
+
+            if result is not None:
+                self._finish(target, result=result)
+            elif target.deadline and loop.time() >= target.deadline:
+                self._finish(target, error=Exception(f"Timed out waiting for {target.key}"))
+            else:
+                target.next_check_at = loop.time() + self._next_interval(target, loop.time())
+        except Exception as e:
+            self._finish(target, error=e)
+        finally:
+            target.checking = False
+            self._wakeup.set()
+
+    def _finish(self, target: PollTarget, result=None, error: Optional[Exception] = None):
+        self._targets.pop(target.key, None)
+        if target.future.done():
+            return
+        if error is not None:
+            target.future.set_exception(error)
+        else:
+            target.future.set_result(result)
+
+    def _first_interval(self, target: PollTarget) -> float:
+        if target.webhook:
+            interval = self.webhook_interval
+        else:
+            interval = min(max(self.min_interval, target.expected_duration / 2), self.max_interval)
+            interval = self._jittered(interval)
+
+        if target.deadline:
+            interval = min(interval, target.deadline - target.started_at)
+        return interval
+
+    def _next_interval(self, target: PollTarget, now: float) -> float:
+        """
+        Before the expected completion time, halve the remaining wait each check;
+        once overdue, back off exponentially up to max_interval
+        """
+        if target.webhook:
+            # Webhooks deliver completion; polling is only a slow safety net
+            interval = self.webhook_interval
+        else:
+            remaining = target.started_at + target.expected_duration - now
+            if remaining > 0:
+                interval = remaining / 2
+            else:
+                interval = self.min_interval * (2 ** min(target.overdue_checks, 10))
+                target.overdue_checks += 1
+            interval = min(max(interval, self.min_interval), self.max_interval)
+
+        if target.deadline:
+            interval = min(interval, max(0, target.deadline - now))
+        return self._jittered(interval)
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+poller = PollerService()
@@ -0,0 +1,161 @@
+import os
+import json
+import unicodedata
+from pathlib import Path
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+DEFAULT_KEYWORDS_PATH = Path(__file__).with_name("prompt_keywords.json")
+
+
+def normalize(text: str) -> str:
+    """
+    Casefold and strip accents, so "Motivación" and "motivacion" match the same keyword
+    """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a set of keywords
+    Finds every keyword occurring anywhere in a text in one pass, however many
+    keywords there are. Each keyword carries a value (its category's priority)
+    Failure links are folded into a full transition table at build time, so
+    matching is a single dict lookup per character
+    """
+
+    def __init__(self, keywords: Dict[str, int]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[int]] = [None]
+
+        for keyword, value in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state] = self._best(self._output[state], value)
+
+        # Breadth-first pass: failure links, and fold each state's suffix matches into its output
+        order = []
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._best(self._output[next_state], self._output[self._fail[next_state]])
+                queue.append(next_state)
+
+        # A failure target is always shallower, so in breadth-first order its
+        # table is complete before the states that fall back to it
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        for state in order:
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+
+    @staticmethod
+    def _best(a: Optional[int], b: Optional[int]) -> Optional[int]:
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return min(a, b)
+
+    def best_match(self, text: str) -> Optional[int]:
+        """
+        Lowest value among the keywords found in text, or None if none occur
+        Stops early once a value-0 keyword is found
+        """
+        delta, output = self._delta, self._output
+        best = None
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            value = output[state]
+            if value is not None and (best is None or value < best):
+                best = value
+                if best == 0:
+                    break
+        return best
+
+
+class PromptClassifier:
+    """
+    Maps a free-text prompt to a content category using the keyword tables in
+    prompt_keywords.json (or PROMPT_KEYWORDS_PATH)
+    Each table lists categories in priority order; the first category with a
+    keyword anywhere in the prompt wins, otherwise the table's default
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("PROMPT_KEYWORDS_PATH") or DEFAULT_KEYWORDS_PATH)
+        self.cache_size = int(os.getenv("PROMPT_CLASSIFIER_CACHE_SIZE", 4096))
+        self._tables = None
+        self._cache = OrderedDict()
+
+    def _load(self) -> Dict[str, dict]:
+        with open(self.path, encoding="utf-8") as f:
+            raw = json.load(f)
+
+        tables = {}
+        for name, table in raw.items():
+            categories = [category["name"] for category in table["categories"]]
+            keywords = {}
+            for priority, category in enumerate(table["categories"]):
+                for keyword in category["keywords"]:
+                    keyword = normalize(keyword)
+                    if keyword and keyword not in keywords:
+                        keywords[keyword] = priority
+            tables[name] = {
+                "categories": categories,
+                "default": table.get("default", "default"),
+                "automaton": KeywordAutomaton(keywords),
+            }
+        return tables
+
+    @property
+    def tables(self) -> Dict[str, dict]:
+        if self._tables is None:
+            self._tables = self._load()
+        return self._tables
+
+    def reload(self):
+        """
+        Re-read the keyword file, e.g. after editing the tables
+        """
+        self._tables = self._load()
+        self._cache.clear()
+
+    def classify(self, table: str, prompt: str) -> str:
+        key = (table, prompt)
+        category = self._cache.get(key)
+        if category is not None:
+            self._cache.move_to_end(key)
+            return category
+
+        spec = self.tables.get(table)
+        if spec is None:
+            raise Exception(f"Unknown prompt classification table: {table}")
+
+        priority = spec["automaton"].best_match(normalize(prompt))
+        category = spec["default"] if priority is None else spec["categories"][priority]
+
+        self._cache[key] = category
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return category
+
+
+prompt_classifier = PromptClassifier()
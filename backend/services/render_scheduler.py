@@ -0,0 +1,192 @@
+import os
+import time
+import heapq
+import asyncio
+from typing import Dict, List, Optional, Callable, Awaitable
+from services.cluster import cluster
+
+SUBMITTING = "submitting"
+RENDERING = "rendering"
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """
+    "paid:4,free:1" -> {"paid": 4.0, "free": 1.0}
+    """
+    weights = {}
+    for item in value.split(","):
+        if item.strip():
+            name, weight = item.split(":")
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+class RenderScheduler:
+    """
+    Decides which waiting jobs may submit to Sora, keeping at most max_in_flight
+    renders running across every worker process
+    A free slot goes to the waiting job whose user has the least render time in
+    flight, weighted by priority class (a paid second counts for less than a free
+    one) and discounted by how long the job has waited, so heavy users can't
+    starve anyone and free jobs still move while paid jobs keep arriving
+    All state is read from the job store, so the leader's decisions hold for
+    every process and survive restarts. Waiting jobs don't hold a worker; on_grant
+    is called with each job granted a slot so it can be queued again
+    """
+
+    def __init__(self, job_store, render_factor: float = 4):
+        self.job_store = job_store
+        self.render_factor = render_factor
+        self.max_in_flight = int(os.getenv("RENDER_MAX_IN_FLIGHT") or os.getenv("SORA_CONCURRENCY") or 4)
+        self.class_weights = parse_weights(os.getenv("RENDER_CLASS_WEIGHTS", "paid:4,free:1"))
+        # Render seconds of credit a waiting job earns per second waited
+        self.aging_rate = float(os.getenv("RENDER_AGING_RATE", 0.1))
+        self.interval = float(os.getenv("RENDER_SCHEDULER_INTERVAL", 1))
+        self.on_grant: Optional[Callable[[str], Awaitable[None]]] = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._snapshot = (0.0, [], [])
+
+    @property
+    def tiers(self) -> List[str]:
+        return list(self.class_weights)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """
+        Dispatch soon, e.g. because a render finished and freed a slot
+        """
+        self._wakeup.set()
+
+    async def dispatch(self) -> int:
+        """
+        Grant free slots to the best waiting jobs; returns how many were granted
+        """
+        in_flight, order = await self._plan(max_age=0)
+        granted = 0
+        for job in order[:max(0, self.max_in_flight - len(in_flight))]:
+            await self.job_store.update(job["video_id"], render_slot=True, render_granted_at=time.time())
+            granted += 1
+            if self.on_grant:
+                await self.on_grant(job["video_id"])
+        if granted:
+            # The next estimate should see these jobs as running
+            self._snapshot = (0.0, [], [])
+        return granted
+
+    async def estimate(self, job: dict) -> dict:
+        """
+        Queue position and expected wait for a job that is waiting for or holding a render slot
+        render_starts_in and eta_seconds are seconds from now
+        """
+        now = time.time()
+        if job["status"] not in (SUBMITTING, RENDERING):
+            # render_slot stays set after the render, so finished jobs are ruled out first
+            return {}
+        if job["status"] == RENDERING or job.get("render_slot"):
+            started = job.get("render_granted_at") or job["updated_at"]
+            return {"queue_position": 0, "eta_seconds": round(max(0.0, started + self._render_time(job) - now))}
+
+        in_flight, order = await self._plan(max_age=self.interval)
+        # Each slot frees up when its current render is expected to finish
+        slots = [
+            max(0.0, (j.get("render_granted_at") or j["updated_at"]) + self._render_time(j) - now)
+            for j in in_flight
+        ]
+        slots += [0.0] * max(0, self.max_in_flight - len(slots))
+        # Over the cap (e.g. after lowering it), the first renders to finish free nothing
+        slots = sorted(slots)[max(0, len(slots) - max(1, self.max_in_flight)):]
+
+        for position, waiting in enumerate(order, start=1):
+            start = heapq.heappop(slots)
+            finish = start + self._render_time(waiting)
+            if waiting["video_id"] == job["video_id"]:
+                return {
+                    "queue_position": position,
+                    "render_starts_in": round(start),
+                    "eta_seconds": round(finish),
+                }
+            heapq.heappush(slots, finish)
+        return {}
+
+    def waiting(self) -> int:
+        return len(self._snapshot[2])
+
+    def in_flight(self) -> int:
+        return len(self._snapshot[1])
+
+    async def _plan(self, max_age: float):
+        """
+        Split the jobs at the render stage into those holding a slot and the
+        waiting ones in the order they would be granted
+        """
+        taken_at, in_flight, order = self._snapshot
+        if time.time() - taken_at <= max_age:
+            return in_flight, order
+
+        now = time.time()
+        jobs = await self.job_store.list_by_status([SUBMITTING, RENDERING])
+        in_flight = [j for j in jobs if j["status"] == RENDERING or j.get("render_slot")]
+        waiting = sorted(
+            (j for j in jobs if j["status"] == SUBMITTING and not j.get("render_slot")),
+            key=lambda j: j["created_at"]
+        )
+
+        load = {}
+        for job in in_flight:
+            load[self._user(job)] = load.get(self._user(job), 0) + job["duration"]
+
+        order = []
+        while waiting:
+            best = min(waiting, key=lambda j: self._score(j, load, now))
+            waiting.remove(best)
+            order.append(best)
+            load[self._user(best)] = load.get(self._user(best), 0) + best["duration"]
+
+        self._snapshot = (now, in_flight, order)
+        return in_flight, order
+
+    def _score(self, job: dict, load: dict, now: float) -> float:
+        # Render seconds the user would have in flight with this job, per unit of class weight
+        weight = self.class_weights.get(job.get("tier"), 1)
+        share = (load.get(self._user(job), 0) + job["duration"]) / weight
+        waited = now - job.get("render_requested_at", job["updated_at"])
+        return share - self.aging_rate * waited
+
+    def _render_time(self, job: dict) -> float:
+        return job["duration"] * self.render_factor
+
+    @staticmethod
+    def _user(job: dict) -> str:
+        return job.get("user_id") or "anonymous"
+
+    async def _run(self):
+        while True:
+            await self._sleep(self._wakeup, self.interval)
+            self._wakeup.clear()
+            # With several processes only the leader hands out slots
+            if not cluster.is_leader:
+                continue
+            try:
+                await self.dispatch()
+            except Exception as e:
+                print(f"Warning: Render scheduling failed: {str(e)}")
+
+    @staticmethod
+    async def _sleep(event: asyncio.Event, timeout: float):
+        """
+        Wait for event or timeout, whichever comes first
+        """
+        timer = asyncio.get_running_loop().call_later(timeout, event.set)
+        try:
+            await event.wait()
+        finally:
+            timer.cancel()
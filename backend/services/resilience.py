@@ -0,0 +1,339 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Optional, Callable, Awaitable
+
+import httpx
+import openai
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Rejections sent before the provider did any work
+UNPROCESSED_STATUS_CODES = {429, 503}
+# Failures before the request left this process
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class ProviderError(Exception):
+    """
+    Error response from a provider we call over plain HTTP (Suno)
+    Carries the response so the resilience layer can decide whether to retry
+    """
+
+    def __init__(self, message: str, response: Optional[httpx.Response] = None):
+        super().__init__(message)
+        self.response = response
+        self.status_code = response.status_code if response is not None else None
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def _setting(prefix: str, name: str, default: float) -> float:
+    """
+    SUNO_RATE_LIMIT falls back to PROVIDER_RATE_LIMIT, then to the built-in default
+    """
+    return float(os.getenv(f"{prefix}_{name}", os.getenv(f"PROVIDER_{name}", default)))
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status_code = getattr(error, "status_code", None)
+    if status_code is None and isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+    return status_code
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits, server errors, timeouts and dropped connections are worth another try
+    Client errors (bad request, auth) are not
+    """
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, openai.APIConnectionError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def is_safe_to_resend(error: Exception) -> bool:
+    """
+    True only if the provider cannot have acted on the request: no connection
+    was made, or it was turned away with 429/503
+    A timeout or dropped connection after sending may have created the resource
+    """
+    # The OpenAI SDK wraps transport errors, keeping the original as the cause
+    cause = error.__cause__ if isinstance(error, openai.APIConnectionError) else error
+    if isinstance(cause, UNSENT_ERRORS):
+        return True
+    return _status_code(error) in UNPROCESSED_STATUS_CODES
+
+
+class TokenBucket:
+    """
+    Smooths request bursts to at most `rate` requests per second
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.waits = 0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.waits += 1
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent requests, plus a small floor
+    Keeps retries from multiplying load on a provider that is already struggling
+    """
+
+    def __init__(self, ratio: float, minimum: int, window: float = 10.0):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self._requests = deque()
+        self._retries = deque()
+
+    def record_request(self):
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        for events in (self._requests, self._retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+        if len(self._retries) >= self.minimum + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls until `reset_timeout` passes
+    Then lets a single trial call through (half-open) to decide whether to close again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def before_call(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("circuit open")
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self.trial_in_flight:
+                raise CircuitOpenError("circuit half-open, trial call in progress")
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class ProviderGuard:
+    """
+    Rate limit, concurrency cap, retries and circuit breaker for one upstream provider
+    """
+
+    def __init__(self, name: str, rate: float = 0, burst: float = 10, max_in_flight: int = 16):
+        self.name = name
+        prefix = name.upper()
+
+        self.bucket = TokenBucket(
+            _setting(prefix, "RATE_LIMIT", rate),
+            _setting(prefix, "BURST", burst)
+        )
+        self.max_in_flight = int(_setting(prefix, "MAX_IN_FLIGHT", max_in_flight))
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.max_retries = int(_setting(prefix, "MAX_RETRIES", 3))
+        self.base_delay = _setting(prefix, "RETRY_BASE_DELAY", 0.5)
+        self.max_delay = _setting(prefix, "RETRY_MAX_DELAY", 20)
+        self.budget = RetryBudget(
+            _setting(prefix, "RETRY_BUDGET_RATIO", 0.2),
+            int(_setting(prefix, "RETRY_BUDGET_MIN", 10))
+        )
+        self.breaker = CircuitBreaker(
+            int(_setting(prefix, "BREAKER_THRESHOLD", 5)),
+            _setting(prefix, "BREAKER_RESET_SECONDS", 30)
+        )
+
+        self.in_flight = 0
+        self.stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "retries_denied": 0,
+            "rejected": 0,
+        }
+
+    def available(self) -> bool:
+        """
+        False while the breaker is open, so callers can skip optional work up front
+        """
+        return not self.breaker.is_open()
+
+    async def call(
+        self,
+        fn: Callable[..., Awaitable],
+        *args,
+        retry: bool = True,
+        idempotent: bool = True,
+        **kwargs
+    ):
+        """
+        Await fn(*args, **kwargs) under this provider's limits
+        Retryable failures are retried with exponential backoff while the retry budget allows
+        Calls that create something billable (idempotent=False) are only retried when
+        the provider can't have received them, so a retry never creates a duplicate
+        """
+        self.stats["calls"] += 1
+        self.budget.record_request()
+        attempt = 0
+        last_error = None
+
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                if last_error is not None:
+                    # Our own retries tripped the breaker: report the real failure
+                    raise last_error
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+            try:
+                await self.bucket.acquire()
+                async with self.semaphore:
+                    self.in_flight += 1
+                    try:
+                        result = await fn(*args, **kwargs)
+                    finally:
+                        self.in_flight -= 1
+            except asyncio.CancelledError:
+                # Don't leave a half-open breaker waiting on a trial that will never report
+                self.breaker.trial_in_flight = False
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+
+                self.breaker.record_failure()
+                self.stats["failures"] += 1
+
+                if not retry or attempt >= self.max_retries:
+                    raise
+                if not idempotent and not is_safe_to_resend(e):
+                    raise
+                if not self.budget.try_spend():
+                    self.stats["retries_denied"] += 1
+                    raise
+
+                attempt += 1
+                last_error = e
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, _retry_after(e)))
+                continue
+
+            self.breaker.record_success()
+            self.stats["successes"] += 1
+            return result
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter keeps retries from many jobs from landing at the same moment
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def metrics(self) -> dict:
+        breaker_state = self.breaker.state
+        if breaker_state == CircuitBreaker.OPEN and not self.breaker.is_open():
+            breaker_state = CircuitBreaker.HALF_OPEN
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rate_limit": self.bucket.rate,
+            "rate_limit_waits": self.bucket.waits,
+            "breaker_state": breaker_state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+class Resilience:
+    """
+    One guard per provider, shared by every service that talks to it
+    """
+
+    DEFAULTS = {
+        "openai": {"rate": 0, "burst": 10, "max_in_flight": 16},
+        "sora": {"rate": 2, "burst": 5, "max_in_flight": 8},
+        "elevenlabs": {"rate": 5, "burst": 10, "max_in_flight": 8},
+        "suno": {"rate": 2, "burst": 5, "max_in_flight": 8},
+    }
+
+    def __init__(self):
+        self._guards = {}
+
+    def guard(self, provider: str) -> ProviderGuard:
+        if provider not in self._guards:
+            self._guards[provider] = ProviderGuard(provider, **self.DEFAULTS.get(provider, {}))
+        return self._guards[provider]
+
+    def metrics(self) -> dict:
+        return {name: guard.metrics() for name, guard in self._guards.items()}
+
+
+resilience = Resilience()
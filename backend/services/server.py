@@ -0,0 +1,84 @@
+import os
+import shutil
+import asyncio
+import uvicorn
+from dotenv import load_dotenv
+from uvicorn.supervisors import Multiprocess
+
+# Before the services are imported, so their settings can come from .env
+load_dotenv()
+
+from services.cluster import cluster
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server whose first SIGTERM/SIGINT starts a drain instead of exiting
+    For drain_grace seconds new uploads and jobs get 503 and /api/health fails,
+    so load balancers stop routing here; then the normal graceful shutdown runs
+    and the lifespan drains the job queue. A second signal skips the grace period
+    """
+
+    def __init__(self, config: uvicorn.Config, drain_grace: float):
+        super().__init__(config)
+        self.drain_grace = drain_grace
+
+    def handle_exit(self, sig, frame):
+        if cluster.draining or self.drain_grace <= 0:
+            super().handle_exit(sig, frame)
+            return
+        cluster.begin_drain()
+        asyncio.get_event_loop().call_later(self.drain_grace, super().handle_exit, sig, frame)
+
+
+class DrainingMultiprocess(Multiprocess):
+    """
+    Signals all workers before waiting on any, so they drain in parallel
+    (uvicorn's supervisor stops them one after another)
+    """
+
+    def shutdown(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+            if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+                from prometheus_client import multiprocess
+                multiprocess.mark_process_dead(process.pid)
+
+
+def prepare_metrics_dir():
+    """
+    prometheus_client's multiprocess mode: every worker writes its metrics to files
+    in a shared directory, which must be empty when the server starts
+    Set before the workers are spawned, since they read it on import
+    """
+    path = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "data/prometheus")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def serve():
+    """
+    Production server: SERVER_WORKERS processes sharing one port
+    """
+    config = uvicorn.Config(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        workers=cluster.workers,
+        # Open progress streams would otherwise hold a draining worker up indefinitely
+        timeout_graceful_shutdown=float(os.getenv("SHUTDOWN_TIMEOUT", 60)),
+    )
+    server = DrainingServer(config, float(os.getenv("DRAIN_GRACE_SECONDS", 5)))
+
+    if cluster.workers > 1:
+        prepare_metrics_dir()
+        sock = config.bind_socket()
+        DrainingMultiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    serve()
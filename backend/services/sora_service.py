@@ -1,73 +1,120 @@
 import os
 import asyncio
+import openai
 from openai import AsyncOpenAI
 from typing import Optional
-import uuid
 from pathlib import Path
+from services.http_pool import http_pool
+from services.downloads import download_file
+from services.poller_service import poller
+from services.asset_service import AssetService
+from services.resilience import resilience, CircuitOpenError
+from services.metrics import record_bytes_written
+
+DEFAULT_RESOLUTION = "1080p"
+DEFAULT_FPS = 30
+
+
+def _missing_file(error: Exception) -> bool:
+    """
+    The provider no longer has a file we passed by id (expired or deleted)
+    """
+    if isinstance(error, openai.NotFoundError):
+        return True
+    message = str(error).lower()
+    return isinstance(error, openai.BadRequestError) and "file" in message and (
+        "not found" in message or "no such" in message
+    )
+
 
 class SoraService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, job_store, storage):
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            http_client=http_pool.client,
+            # Retries are handled by the shared resilience layer
+            max_retries=0
+        )
+        self.guard = resilience.guard("sora")
         self.videos_dir = Path("generated_videos")
         self.videos_dir.mkdir(exist_ok=True)
-        self.video_jobs = {}
-
-    async def generate_video(
+        self.job_store = job_store
+        self.storage = storage
+        self.assets = AssetService(self.client)
+        # Rough render time per second of output, used to schedule status checks
+        self.render_factor = float(os.getenv("SORA_RENDER_SECONDS_PER_SECOND", 4))
+        # A render still unfinished after this long is failed, freeing its render slot
+        self.render_timeout = float(os.getenv("SORA_RENDER_TIMEOUT", 1800))
+        self.webhooks_enabled = os.getenv("SORA_WEBHOOKS_ENABLED", "false").lower() == "true"
+
+    async def submit_video(
         self,
         prompt: str,
         image_path: str,
         voice_path: Optional[str] = None,
         music_path: Optional[str] = None,
-        duration: int = 30
+        duration: int = 30,
+        resolution: str = DEFAULT_RESOLUTION,
+        fps: int = DEFAULT_FPS,
+        seed: Optional[int] = None
     ) -> str:
         """
-        Generate video using Sora 2 API
+        Submit a video generation job to Sora 2 API
+        The same inputs, settings and seed reproduce a render (previews rely on this)
+        Returns the Sora job id
         """
-        video_id = str(uuid.uuid4())
-
+        inputs = [(image_path, "vision"), (voice_path, "user_data"), (music_path, "user_data")]
         try:
-            # Read the image file
-            with open(image_path, "rb") as image_file:
-                image_data = image_file.read()
-
-            # Enhanced prompt for Sora 2
-            enhanced_prompt = self._enhance_prompt(prompt, duration)
-
-            # Call Sora 2 API (using the new image-to-video capability)
-            response = await self.client.videos.generate(
-                model="sora-2.0",
-                prompt=enhanced_prompt,
-                image=image_data,
-                duration=duration,
-                resolution="1080p",
-                fps=30,
-                # Include audio if available
-                audio={
-                    "voice": open(voice_path, "rb").read() if voice_path else None,
-                    "music": open(music_path, "rb").read() if music_path else None
-                } if (voice_path or music_path) else None
-            )
-
-            # Store job info
-            self.video_jobs[video_id] = {
-                "status": "processing",
-                "sora_job_id": response.id,
-                "prompt": prompt
-            }
-
-            # Start background task to check status and download
-            asyncio.create_task(self._monitor_video_generation(video_id, response.id))
-
-            return video_id
+            try:
+                response = await self._generate(prompt, inputs, duration, resolution, fps, seed)
+            except Exception as e:
+                if not _missing_file(e):
+                    raise
+                # A cached file id expired or was deleted upstream: upload again, once
+                await asyncio.gather(*(
+                    self.assets.invalidate(path, purpose) for path, purpose in inputs if path
+                ))
+                response = await self._generate(prompt, inputs, duration, resolution, fps, seed)
+
+            return response.id
 
         except Exception as e:
-            self.video_jobs[video_id] = {
-                "status": "failed",
-                "error": str(e)
-            }
             raise Exception(f"Error generating video: {str(e)}")
 
-    def _enhance_prompt(self, prompt: str, duration: int) -> str:
+    async def _generate(self, prompt: str, inputs: list, duration: int, resolution: str, fps: int, seed: Optional[int]):
+        # Inputs are uploaded once per content hash and passed by reference
+        image_file_id, voice_file_id, music_file_id = await asyncio.gather(*(
+            self._file_id(path, purpose) for path, purpose in inputs
+        ))
+
+        # Enhanced prompt for Sora 2
+        enhanced_prompt = self._enhance_prompt(prompt, duration, resolution)
+
+        # Call Sora 2 API (using the new image-to-video capability)
+        return await self.guard.call(
+            self.client.videos.generate,
+            idempotent=False,
+            model="sora-2.0",
+            prompt=enhanced_prompt,
+            image=image_file_id,
+            duration=duration,
+            resolution=resolution,
+            fps=fps,
+            seed=seed,
+            # Include audio if available
+            audio={
+                "voice": voice_file_id,
+                "music": music_file_id
+            } if (voice_file_id or music_file_id) else None
+        )
+
+    async def _file_id(self, path: Optional[str], purpose: str) -> Optional[str]:
+        if not path:
+            return None
+        return await self.assets.get_file_id(path, purpose=purpose)
+
+    def _enhance_prompt(self, prompt: str, duration: int, resolution: str = DEFAULT_RESOLUTION) -> str:
         """
         Enhance the user's prompt with additional details for better Sora 2 generation
         """
@@ -82,55 +129,59 @@ Technical Requirements:
 - Professional cinematography with smooth camera movements
 - High-quality lighting (cinematic, well-lit)
 - Natural movements and realistic physics
-- Sharp focus and 1080p quality
+- Sharp focus and {resolution} quality
 - Maintain continuity throughout the video
 
 Style: Professional social media content, engaging, dynamic, visually appealing
 """
         return enhanced.strip()
 
-    async def _monitor_video_generation(self, video_id: str, sora_job_id: str):
+    async def wait_for_video(self, sora_job_id: str, duration: int = 30) -> str:
         """
-        Monitor Sora video generation and download when ready
+        Wait for Sora video generation to complete
+        Status checks are scheduled by the shared poller (or triggered by a webhook)
+        Returns the URL of the rendered video; raises after render_timeout seconds
         """
+        return await poller.wait(
+            f"sora:{sora_job_id}",
+            lambda: self._check_video(sora_job_id),
+            expected_duration=duration * self.render_factor,
+            timeout=self.render_timeout,
+            webhook=self.webhooks_enabled
+        )
+
+    async def _check_video(self, sora_job_id: str) -> Optional[str]:
+        # Check status
         try:
-            while True:
-                # Check status
-                status_response = await self.client.videos.retrieve(sora_job_id)
-
-                if status_response.status == "completed":
-                    # Download video
-                    video_url = status_response.output.url
-                    video_path = self.videos_dir / f"{video_id}.mp4"
-
-                    # Download the video file
-                    import httpx
-                    async with httpx.AsyncClient() as client:
-                        response = await client.get(video_url)
-                        with open(video_path, "wb") as f:
-                            f.write(response.content)
-
-                    self.video_jobs[video_id]["status"] = "completed"
-                    self.video_jobs[video_id]["video_path"] = str(video_path)
-                    break
-
-                elif status_response.status == "failed":
-                    self.video_jobs[video_id]["status"] = "failed"
-                    self.video_jobs[video_id]["error"] = "Sora generation failed"
-                    break
-
-                # Wait before checking again
-                await asyncio.sleep(5)
+            status_response = await self.guard.call(self.client.videos.retrieve, sora_job_id)
+        except CircuitOpenError:
+            # The render itself is unaffected; check again on the next poll
+            return None
 
-        except Exception as e:
-            self.video_jobs[video_id]["status"] = "failed"
-            self.video_jobs[video_id]["error"] = str(e)
+        if status_response.status == "completed":
+            return status_response.output.url
+
+        if status_response.status == "failed":
+            raise Exception("Sora generation failed")
+
+        return None
+
+    async def download_video(self, video_url: str, video_id: str) -> str:
+        """
+        Stream a rendered video into the videos directory and hand it to storage
+        Returns the stored location
+        """
+        video_path = self.videos_dir / f"{video_id}.mp4"
+        result = await download_file(video_url, video_path)
+        record_bytes_written("video", result["size"])
+        return await self.storage.save(Path(result["path"]), f"{video_id}.mp4")
 
     async def get_video_status(self, video_id: str) -> dict:
         """
         Get the status of a video generation job
         """
-        if video_id not in self.video_jobs:
+        job = await self.job_store.get(video_id)
+        if job is None:
             raise Exception("Video job not found")
 
-        return self.video_jobs[video_id]
+        return job
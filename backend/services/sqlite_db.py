@@ -0,0 +1,39 @@
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Optional
+
+
+class SQLiteDB:
+    """
+    SQLite connection shared by the worker threads of one service
+    WAL mode and a busy timeout let every worker process on the host use the same
+    file; statements on this connection are serialized by lock (callers run them
+    through asyncio.to_thread, never on the event loop)
+    """
+
+    def __init__(self, path: str, synchronous: Optional[str] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        if synchronous:
+            self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Write transaction taken up front (BEGIN IMMEDIATE), so a read-modify-write
+        can't interleave with other processes; holds the lock throughout
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
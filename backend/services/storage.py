@@ -0,0 +1,136 @@
+import os
+import asyncio
+from pathlib import Path
+from typing import Optional
+from services.file_io import file_io
+
+
+class StorageBackend:
+    """
+    Where finished videos live once they have been downloaded from Sora
+    """
+
+    async def save(self, local_path: Path, key: str) -> str:
+        """
+        Store a local file under key and return its location
+        """
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> Optional[dict]:
+        """
+        Size and modification time of a stored object, or None if it doesn't exist
+        """
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """
+        Path to serve directly from disk, or None when the backend is remote
+        """
+        return None
+
+    async def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        """
+        Time-limited URL clients can fetch the object from directly
+        """
+        return None
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    async def save(self, local_path: Path, key: str) -> str:
+        dest = self.root / key
+        if Path(local_path).resolve() != dest.resolve():
+            await file_io.replace(local_path, dest)
+        return str(dest)
+
+    async def stat(self, key: str) -> Optional[dict]:
+        stat = await file_io.stat(self.root / key)
+        if stat is None:
+            return None
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self.root / key
+
+    async def delete(self, key: str):
+        await file_io.unlink(self.root / key)
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible object storage (AWS S3, MinIO, R2)
+    Videos are served through pre-signed redirects so the bytes never pass through the API workers
+    """
+
+    def __init__(self):
+        try:
+            import boto3
+        except ImportError:
+            raise Exception("S3 storage requires boto3: pip install boto3")
+
+        self.bucket = os.getenv("S3_BUCKET", "relai-videos")
+        self.prefix = os.getenv("S3_PREFIX", "videos/")
+        self.url_expiry = int(os.getenv("S3_URL_EXPIRY", 3600))
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            region_name=os.getenv("S3_REGION", "us-east-1"),
+            aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY")
+        )
+
+    async def save(self, local_path: Path, key: str) -> str:
+        # upload_file switches to multipart uploads for large videos
+        await asyncio.to_thread(
+            self.client.upload_file,
+            str(local_path),
+            self.bucket,
+            self.prefix + key,
+            ExtraArgs={"ContentType": "video/mp4"}
+        )
+        await file_io.unlink(local_path)
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    async def stat(self, key: str) -> Optional[dict]:
+        try:
+            head = await asyncio.to_thread(
+                self.client.head_object, Bucket=self.bucket, Key=self.prefix + key
+            )
+        except self.client.exceptions.ClientError:
+            return None
+        return {"size": head["ContentLength"], "mtime": head["LastModified"].timestamp()}
+
+    async def presigned_url(self, key: str, filename: str) -> Optional[str]:
+        return await asyncio.to_thread(
+            self.client.generate_presigned_url,
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.prefix + key,
+                "ResponseContentDisposition": f'attachment; filename="{filename}"'
+            },
+            ExpiresIn=self.url_expiry
+        )
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.prefix + key)
+
+
+def create_storage(videos_dir: Path) -> StorageBackend:
+    """
+    Build the storage backend configured through STORAGE_BACKEND ("local" or "s3")
+    """
+    backend = os.getenv("STORAGE_BACKEND", "local")
+
+    if backend == "local":
+        return LocalStorage(videos_dir)
+    if backend == "s3":
+        return S3Storage()
+
+    raise Exception(f"Unknown storage backend: {backend}")
@@ -1,23 +1,279 @@
 import os
+import re
+import time
+import asyncio
 from openai import AsyncOpenAI
-from typing import List, Optional
+from typing import List, Optional, AsyncIterator
+from services.http_pool import http_pool
+from services.cache_utils import TTLCache, SingleFlight, cache_key
+from services.resilience import resilience
+from services.prompt_classifier import normalize
+from services import metrics
+
+# Words that don't change which suggestions make sense
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "on", "in", "at", "to", "with", "my", "our",
+    "i", "im", "me", "about", "content", "creator", "videos", "video", "ideas", "focused",
+}
+
+# Near-synonyms users type for the same niche
+SYNONYMS = {
+    "fitness": "gym",
+    "workout": "gym",
+    "training": "gym",
+    "exercise": "gym",
+    "bodybuilding": "gym",
+    "funny": "comedy",
+    "humor": "comedy",
+    "motivational": "motivation",
+    "inspirational": "motivation",
+}
+
+
+class SuggestionParser:
+    """
+    Incremental parser for the Title:/Description:/.../Hook: suggestion format
+    Feed it text as it streams in; each suggestion is returned when the next Title
+    starts (or at close), so fields written after Hook still land in it
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.current = {}
+
+    def feed(self, text: str) -> List[dict]:
+        self.buffer += text
+        completed = []
+
+        # Only whole lines are parsed; the trailing partial line waits for more text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            suggestion = self._parse_line(line)
+            if suggestion:
+                completed.append(suggestion)
+
+        return completed
+
+    def close(self) -> List[dict]:
+        """
+        Flush the final line and any suggestion still being built
+        """
+        completed = self.feed("\n")
+        if self.current:
+            completed.append(self.current)
+            self.current = {}
+        return completed
+
+    def _parse_line(self, line: str) -> Optional[dict]:
+        line = line.strip()
+        finished = None
+
+        if line.startswith("Title:"):
+            # Save previous suggestion if exists
+            if self.current:
+                finished = self.current
+            self.current = {"title": line.replace("Title:", "").strip()}
+
+        elif line.startswith("Description:"):
+            self.current["description"] = line.replace("Description:", "").strip()
+
+        elif line.startswith("Duration:"):
+            duration_text = line.replace("Duration:", "").strip()
+            # Extract number
+            try:
+                self.current["duration"] = int(''.join(filter(str.isdigit, duration_text)))
+            except ValueError:
+                self.current["duration"] = 30
+
+        elif line.startswith("Platforms:"):
+            platforms_text = line.replace("Platforms:", "").strip()
+            self.current["platforms"] = [p.strip() for p in platforms_text.split(",")]
+
+        elif line.startswith("Hashtags:"):
+            hashtags_text = line.replace("Hashtags:", "").strip()
+            self.current["hashtags"] = [h.strip() for h in hashtags_text.split(",")]
+
+        elif line.startswith("Hook:"):
+            self.current["hook"] = line.replace("Hook:", "").strip()
+
+        return finished
+
 
 class SuggestionService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            http_client=http_pool.client,
+            # Retries are handled by the shared resilience layer
+            max_retries=0
+        )
+        self.guard = resilience.guard("openai")
+        self.cache = TTLCache(
+            max_entries=int(os.getenv("SUGGESTION_CACHE_SIZE", 1000)),
+            ttl=float(os.getenv("SUGGESTION_CACHE_TTL", 3600))
+        )
+        self.single_flight = SingleFlight()
+        self.batch_concurrency = int(os.getenv("SUGGESTION_BATCH_CONCURRENCY", 4))
 
     async def generate_suggestions(
         self,
         context: str,
         user_preferences: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Generate creative video ideas for social media content
+        Served from cache for equivalent contexts; concurrent identical requests share one call
+        """
+        key = cache_key(
+            "suggestions", self._normalize(context), self._normalize(user_preferences or "")
+        )
+
+        suggestions = self.cache.get(key)
+        if suggestions is None:
+            suggestions = await self.single_flight.do(
+                key, lambda: self._generate_cached(key, context, user_preferences)
+            )
+
+        # Callers get their own copies so they can't mutate the cached entry
+        return [dict(suggestion) for suggestion in suggestions]
+
+    async def generate_batch(self, requests: List[dict]) -> List[dict]:
+        """
+        Generate suggestions for many contexts with bounded concurrency
+        Each result carries either "suggestions" or "error"
+        """
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def run(request: dict) -> dict:
+            async with semaphore:
+                try:
+                    suggestions = await self.generate_suggestions(
+                        request["context"], request.get("user_preferences")
+                    )
+                    return {"context": request["context"], "suggestions": suggestions}
+                except Exception as e:
+                    return {"context": request["context"], "error": str(e)}
+
+        return await asyncio.gather(*[run(request) for request in requests])
+
+    async def stream_suggestions(
+        self,
+        context: str,
+        user_preferences: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Yield suggestions one at a time as soon as each is complete in the token stream
+        """
+        key = cache_key(
+            "suggestions", self._normalize(context), self._normalize(user_preferences or "")
+        )
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            for suggestion in cached:
+                yield dict(suggestion)
+            return
+
+        parser = SuggestionParser()
+        suggestions = []
+        started = time.perf_counter()
+
+        try:
+            stream = await self.guard.call(
+                self.client.chat.completions.create,
+                model="gpt-4-turbo-preview",
+                messages=self._build_messages(context, user_preferences),
+                temperature=0.8,
+                max_tokens=2000,
+                stream=True
+            )
+
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                for suggestion in parser.feed(delta):
+                    if not suggestions:
+                        metrics.observe_stage("suggestions_first_result", time.perf_counter() - started)
+                    suggestions.append(suggestion)
+                    yield dict(suggestion)
+
+            for suggestion in parser.close():
+                suggestions.append(suggestion)
+                yield dict(suggestion)
+
+        except Exception as e:
+            metrics.observe_stage("suggestions_stream", time.perf_counter() - started, "error")
+            raise Exception(f"Error generating suggestions: {str(e)}")
+
+        metrics.observe_stage("suggestions_stream", time.perf_counter() - started)
+        self.cache.set(key, suggestions)
+
+    def _normalize(self, text: str) -> str:
+        """
+        Canonical form of a context: casefolded words without accents, no stopwords,
+        synonyms folded, sorted
+        Contexts with nothing left after that are keyed by their own text instead,
+        so unrelated ones never share an empty key
+        """
+        words = set()
+        for word in re.findall(r"\w+", normalize(text)):
+            if word in STOPWORDS:
+                continue
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            words.add(SYNONYMS.get(word, word))
+        if not words and text.strip():
+            # The prefix keeps these apart from any normalized word list
+            return "=" + " ".join(text.casefold().split())
+        return " ".join(sorted(words))
+
+    async def _generate_cached(
+        self,
+        key: str,
+        context: str,
+        user_preferences: Optional[str]
+    ) -> List[dict]:
+        suggestions = await self._generate(context, user_preferences)
+        self.cache.set(key, suggestions)
+        return suggestions
+
+    async def _generate(
+        self,
+        context: str,
+        user_preferences: Optional[str] = None
     ) -> List[dict]:
         """
         Generate creative video ideas for social media content
         Uses GPT-4 to create engaging, trendy suggestions
         """
         try:
-            # Build the prompt for GPT
-            system_prompt = """You are a creative social media content strategist specializing in viral video ideas.
+            # Call GPT-4
+            with metrics.stage("suggestions"):
+                response = await self.guard.call(
+                    self.client.chat.completions.create,
+                    model="gpt-4-turbo-preview",
+                    messages=self._build_messages(context, user_preferences),
+                    temperature=0.8,
+                    max_tokens=2000
+                )
+
+            # Parse response into structured suggestions
+            suggestions_text = response.choices[0].message.content
+            suggestions = self._parse_suggestions(suggestions_text)
+
+            return suggestions
+
+        except Exception as e:
+            raise Exception(f"Error generating suggestions: {str(e)}")
+
+    def _build_messages(self, context: str, user_preferences: Optional[str] = None) -> List[dict]:
+        """
+        System and user messages for the suggestions prompt
+        """
+        # Build the prompt for GPT
+        system_prompt = """You are a creative social media content strategist specializing in viral video ideas.
 Generate engaging, creative video concepts that work well with AI video generation (Sora 2).
 
 For each suggestion, provide:
@@ -35,7 +291,7 @@ Focus on:
 - Ideas that work well with AI generation (no complex face-to-face interactions)
 """
 
-            user_prompt = f"""Generate 5 creative video ideas based on this context:
+        user_prompt = f"""Generate 5 creative video ideas based on this context:
 
 Context: {context}
 
@@ -52,70 +308,18 @@ Hashtags: [5 relevant hashtags]
 Hook: [first 3 seconds description]
 """
 
-            # Call GPT-4
-            response = await self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=2000
-            )
-
-            # Parse response into structured suggestions
-            suggestions_text = response.choices[0].message.content
-            suggestions = self._parse_suggestions(suggestions_text)
-
-            return suggestions
-
-        except Exception as e:
-            raise Exception(f"Error generating suggestions: {str(e)}")
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
 
     def _parse_suggestions(self, text: str) -> List[dict]:
         """
         Parse GPT response into structured suggestion objects
         """
-        suggestions = []
-        current_suggestion = {}
-
-        lines = text.split("\n")
-
-        for line in lines:
-            line = line.strip()
-
-            if line.startswith("Title:"):
-                # Save previous suggestion if exists
-                if current_suggestion:
-                    suggestions.append(current_suggestion)
-                current_suggestion = {"title": line.replace("Title:", "").strip()}
-
-            elif line.startswith("Description:"):
-                current_suggestion["description"] = line.replace("Description:", "").strip()
-
-            elif line.startswith("Duration:"):
-                duration_text = line.replace("Duration:", "").strip()
-                # Extract number
-                try:
-                    current_suggestion["duration"] = int(''.join(filter(str.isdigit, duration_text)))
-                except:
-                    current_suggestion["duration"] = 30
-
-            elif line.startswith("Platforms:"):
-                platforms_text = line.replace("Platforms:", "").strip()
-                current_suggestion["platforms"] = [p.strip() for p in platforms_text.split(",")]
-
-            elif line.startswith("Hashtags:"):
-                hashtags_text = line.replace("Hashtags:", "").strip()
-                current_suggestion["hashtags"] = [h.strip() for h in hashtags_text.split(",")]
-
-            elif line.startswith("Hook:"):
-                current_suggestion["hook"] = line.replace("Hook:", "").strip()
-
-        # Add last suggestion
-        if current_suggestion:
-            suggestions.append(current_suggestion)
-
+        parser = SuggestionParser()
+        suggestions = parser.feed(text)
+        suggestions.extend(parser.close())
         return suggestions
 
     async def enhance_prompt(self, basic_prompt: str) -> str:
@@ -137,7 +341,8 @@ Include details about:
 
 Keep the enhanced prompt clear and concise but detailed."""
 
-            response = await self.client.chat.completions.create(
+            response = await self.guard.call(
+                self.client.chat.completions.create,
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -0,0 +1,57 @@
+import os
+from pathlib import Path
+from typing import Optional, AsyncIterator
+from services.cache_utils import cache_key, touch, evict_lru
+from services.metrics import record_bytes_written
+from services.file_io import file_io
+
+
+class TTSCache:
+    """
+    Disk-backed cache of synthesized narration
+    Keyed by (narration text, voice_id, model_id, voice settings)
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(os.getenv("TTS_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+
+    def key(self, text: str, voice_id: str, model_id: str, voice_settings: Optional[dict]) -> str:
+        return cache_key("tts", text, voice_id, model_id, voice_settings)
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.mp3"
+
+    async def get(self, key: str) -> Optional[Path]:
+        return await file_io.run(self._get, key)
+
+    async def put_stream(self, key: str, chunks: AsyncIterator[bytes]) -> Path:
+        """
+        Write an audio stream into the cache atomically and return its path
+        """
+        path = self.path(key)
+        await file_io.run(path.parent.mkdir, parents=True, exist_ok=True)
+        part_path = path.with_name(path.name + ".part")
+
+        try:
+            async with file_io.open_writer(part_path) as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+            await file_io.replace(part_path, path)
+            record_bytes_written("tts", f.size)
+        finally:
+            await file_io.unlink(part_path)
+
+        await self.enforce_quota()
+        return path
+
+    async def enforce_quota(self) -> int:
+        return await file_io.run(evict_lru, self.root, self.max_bytes, "*/*.mp3")
+
+    def _get(self, key: str) -> Optional[Path]:
+        path = self.path(key)
+        if not path.exists():
+            return None
+        touch(path)
+        return path
@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+from typing import Optional, List, Set
+from services.file_io import file_io
+from services.sqlite_db import SQLiteDB
+
+
+class UploadRegistry:
+    """
+    Index of uploaded files (id -> path, mime type, size, hash, created_at)
+    """
+
+    def __init__(self, path: str):
+        self.ttl = float(os.getenv("UPLOAD_TTL_HOURS", 24)) * 3600
+        self.db = SQLiteDB(path)
+        self.db.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS uploads (
+                file_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mime_type TEXT,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self.db.conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_created_at ON uploads (created_at)")
+
+    async def add(
+        self,
+        file_id: str,
+        kind: str,
+        path: str,
+        mime_type: Optional[str],
+        size: int,
+        sha256: str
+    ) -> dict:
+        record = {
+            "file_id": file_id,
+            "kind": kind,
+            "path": str(path),
+            "mime_type": mime_type,
+            "size": size,
+            "sha256": sha256,
+            "created_at": time.time(),
+        }
+        await asyncio.to_thread(self._add, record)
+        return record
+
+    async def get(self, file_id: str, kind: Optional[str] = None) -> Optional[dict]:
+        """
+        Look up an upload by id, optionally restricted to one kind ("image" or "voice")
+        """
+        record = await asyncio.to_thread(self._get, file_id)
+        if record is None or (kind and record["kind"] != kind):
+            return None
+        return record
+
+    async def remove_expired(self, keep: Optional[Set[str]] = None) -> int:
+        """
+        Delete uploads older than the TTL, both the files and their index rows
+        Uploads whose absolute path is in keep (still needed by a job) are left for a later sweep
+        """
+        expired = await asyncio.to_thread(self._expired, time.time() - self.ttl)
+        if keep:
+            expired = [record for record in expired if os.path.abspath(record["path"]) not in keep]
+        for record in expired:
+            await file_io.unlink(record["path"])
+        await asyncio.to_thread(self._remove, [record["file_id"] for record in expired])
+        return len(expired)
+
+    async def remove_paths(self, paths: List[str]):
+        """
+        Drop the index rows of uploads whose files were deleted elsewhere (e.g. the disk quota sweep)
+        """
+        if paths:
+            await asyncio.to_thread(self._remove_paths, paths)
+
+    def _add(self, record: dict):
+        with self.db.lock:
+            self.db.conn.execute(
+                "INSERT OR REPLACE INTO uploads (file_id, kind, path, mime_type, size, sha256, created_at) "
+                "VALUES (:file_id, :kind, :path, :mime_type, :size, :sha256, :created_at)",
+                record
+            )
+
+    def _get(self, file_id: str) -> Optional[dict]:
+        with self.db.lock:
+            cursor = self.db.conn.execute("SELECT * FROM uploads WHERE file_id = ?", (file_id,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def _expired(self, cutoff: float) -> List[dict]:
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                "SELECT file_id, path FROM uploads WHERE created_at < ?", (cutoff,)
+            ).fetchall()
+        return [{"file_id": row[0], "path": row[1]} for row in rows]
+
+    def _remove(self, file_ids: List[str]):
+        with self.db.lock:
+            self.db.conn.executemany("DELETE FROM uploads WHERE file_id = ?", [(f,) for f in file_ids])
+
+    def _remove_paths(self, paths: List[str]):
+        # Rows hold the path as given at upload time; match it relative or absolute
+        params = [(str(path), os.path.abspath(path)) for path in paths]
+        with self.db.lock:
+            self.db.conn.executemany("DELETE FROM uploads WHERE path IN (?, ?)", params)
@@ -0,0 +1,90 @@
+import os
+import hashlib
+from pathlib import Path
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from services.metrics import record_bytes_written
+from services.file_io import file_io
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+class UploadService:
+    def __init__(self):
+        self.max_upload_size = int(os.getenv("MAX_UPLOAD_SIZE", 10485760))
+        self.chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", 256 * 1024))
+        self.max_image_dimension = int(os.getenv("MAX_IMAGE_DIMENSION", 1920))
+        self.image_quality = int(os.getenv("IMAGE_JPEG_QUALITY", 90))
+
+    async def save(self, file: UploadFile, dest: Path) -> dict:
+        """
+        Stream an upload to disk in fixed-size chunks
+        Aborts as soon as the size limit is exceeded and hashes the bytes as they are written
+        """
+        part_path = dest.with_name(dest.name + ".part")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            async with file_io.open_writer(part_path, digest=digest) as f:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_upload_size:
+                        raise UploadTooLarge(
+                            f"File exceeds the {self.max_upload_size} byte upload limit"
+                        )
+                    await f.write(chunk)
+
+            await file_io.replace(part_path, dest)
+        finally:
+            await file_io.unlink(part_path)
+
+        record_bytes_written("upload", size)
+        return {"path": str(dest), "size": size, "sha256": digest.hexdigest()}
+
+    async def normalize_image(self, path: Path) -> Path:
+        """
+        Validate and re-encode an uploaded image off the event loop
+        """
+        return await file_io.run(self._normalize_image, Path(path))
+
+    def _normalize_image(self, path: Path) -> Path:
+        """
+        Apply EXIF orientation, bound the longest side and re-encode as JPEG
+        """
+        try:
+            with Image.open(path) as image:
+                image.verify()
+
+            # verify() leaves the image unusable, so it has to be reopened
+            with Image.open(path) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.max_image_dimension, self.max_image_dimension))
+                if image.mode != "RGB":
+                    image = image.convert("RGB")
+
+                normalized_path = path.with_suffix(".jpg")
+                tmp_path = path.with_name(path.stem + ".normalized.jpg")
+                image.save(tmp_path, "JPEG", quality=self.image_quality, optimize=True)
+        except Image.DecompressionBombError:
+            path.unlink(missing_ok=True)
+            raise UploadTooLarge(f"Image exceeds the {Image.MAX_IMAGE_PIXELS} pixel limit")
+        except (UnidentifiedImageError, OSError, SyntaxError) as e:
+            path.unlink(missing_ok=True)
+            # PIL's message names the file on disk; log it, don't return it
+            print(f"Warning: Rejected image upload {path.name}: {str(e)}")
+            raise InvalidUpload("File is not a valid image")
+
+        os.replace(tmp_path, normalized_path)
+        if normalized_path != path:
+            path.unlink(missing_ok=True)
+        return normalized_path
@@ -0,0 +1,116 @@
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from services.file_io import file_io
+
+CHUNK_SIZE = int(os.getenv("VIDEO_STREAM_CHUNK_SIZE", 256 * 1024))
+
+# When set (e.g. "/protected-videos/"), nginx serves the file itself with sendfile
+ACCEL_REDIRECT_PREFIX = os.getenv("VIDEO_ACCEL_REDIRECT_PREFIX")
+
+
+def _etag(size: int, mtime: float) -> str:
+    return f'"{int(mtime * 1000):x}-{size:x}"'
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into inclusive offsets
+    Returns None if the header is malformed or unsatisfiable
+    """
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    size: int,
+    mtime: float,
+    media_type: str,
+    filename: str
+) -> Response:
+    """
+    Serve a local file with byte-range and conditional-GET support
+    """
+    etag = _etag(size, mtime)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+
+    if _not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    start, end = 0, size - 1
+    status_code = 200
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send the whole file
+    if range_header and (not if_range or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+
+    if ACCEL_REDIRECT_PREFIX:
+        # Let the reverse proxy do zero-copy sendfile, including the range handling
+        return Response(
+            headers={
+                "X-Accel-Redirect": ACCEL_REDIRECT_PREFIX + path.name,
+                "Content-Type": media_type,
+                "Content-Disposition": headers["Content-Disposition"],
+                "ETag": etag,
+            }
+        )
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        file_io.read_chunks(path, start, end, CHUNK_SIZE),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
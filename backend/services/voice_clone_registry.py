@@ -0,0 +1,76 @@
+import time
+import asyncio
+from typing import Optional, List
+from services.sqlite_db import SQLiteDB
+
+
+class VoiceCloneRegistry:
+    """
+    Persistent mapping from a voice sample's content hash to its ElevenLabs voice_id
+    """
+
+    def __init__(self, path: str):
+        self.db = SQLiteDB(path)
+        self.db.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS voice_clones (
+                sample_sha256 TEXT PRIMARY KEY,
+                voice_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self.db.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_voice_clones_last_used ON voice_clones (last_used_at)"
+        )
+
+    async def get(self, sample_sha256: str) -> Optional[str]:
+        """
+        Look up the voice_id for a sample and mark it as used
+        """
+        return await asyncio.to_thread(self._get, sample_sha256)
+
+    async def put(self, sample_sha256: str, voice_id: str):
+        await asyncio.to_thread(self._put, sample_sha256, voice_id)
+
+    async def remove(self, sample_sha256: str):
+        await asyncio.to_thread(self._remove, sample_sha256)
+
+    async def stale(self, max_age: float) -> List[dict]:
+        """
+        Clones that haven't been used for max_age seconds
+        """
+        return await asyncio.to_thread(self._stale, time.time() - max_age)
+
+    def _get(self, sample_sha256: str) -> Optional[str]:
+        with self.db.lock:
+            row = self.db.conn.execute(
+                "SELECT voice_id FROM voice_clones WHERE sample_sha256 = ?", (sample_sha256,)
+            ).fetchone()
+            if row:
+                self.db.conn.execute(
+                    "UPDATE voice_clones SET last_used_at = ? WHERE sample_sha256 = ?",
+                    (time.time(), sample_sha256)
+                )
+        return row[0] if row else None
+
+    def _put(self, sample_sha256: str, voice_id: str):
+        now = time.time()
+        with self.db.lock:
+            self.db.conn.execute(
+                "INSERT OR REPLACE INTO voice_clones (sample_sha256, voice_id, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?)",
+                (sample_sha256, voice_id, now, now)
+            )
+
+    def _remove(self, sample_sha256: str):
+        with self.db.lock:
+            self.db.conn.execute("DELETE FROM voice_clones WHERE sample_sha256 = ?", (sample_sha256,))
+
+    def _stale(self, cutoff: float) -> List[dict]:
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                "SELECT sample_sha256, voice_id FROM voice_clones WHERE last_used_at < ?", (cutoff,)
+            ).fetchall()
+        return [{"sample_sha256": row[0], "voice_id": row[1]} for row in rows]
@@ -1,14 +1,63 @@
 import os
 import uuid
+import asyncio
 from pathlib import Path
+from typing import Optional
 from elevenlabs import VoiceSettings
 from elevenlabs.client import AsyncElevenLabs
+from services.http_pool import http_pool
+from services.cache_utils import SingleFlight, file_sha256, link_or_copy
+from services.voice_clone_registry import VoiceCloneRegistry
+from services.tts_cache import TTSCache
+from services.resilience import resilience
+from services import metrics
+from services.file_io import file_io
+from services.prompt_classifier import prompt_classifier
+from services.cluster import cluster
+
+TTS_MODEL_ID = "eleven_multilingual_v2"
+
+DEFAULT_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.5,
+    "use_speaker_boost": True,
+}
+
+# Narration templates per content category (see prompt_keywords.json)
+NARRATION_TEMPLATES = {
+    "workout": "Hey everyone! Today I'm showing you an amazing workout. {prompt}. Let's get started and crush this training session!",
+    "exercise": "What's up! Ready for today's exercise routine? {prompt}. Let's do this together!",
+    "default": "Hello! Check out what I've got for you today. {prompt}. Stay tuned and don't forget to like and subscribe!",
+}
+
 
 class VoiceService:
     def __init__(self):
-        self.client = AsyncElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+        self.client = AsyncElevenLabs(
+            api_key=os.getenv("ELEVENLABS_API_KEY"),
+            base_url=os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io"),
+            httpx_client=http_pool.client
+        )
+        self.guard = resilience.guard("elevenlabs")
         self.output_dir = Path("uploads/voices")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.tts_cache = TTSCache(self.output_dir / "cache")
+        self.tts_single_flight = SingleFlight()
+        self.clone_registry = VoiceCloneRegistry(os.getenv("VOICE_CLONE_DB", "data/voice_clones.db"))
+        self.clone_single_flight = SingleFlight()
+        self.clone_ttl = float(os.getenv("VOICE_CLONE_TTL_DAYS", 30)) * 86400
+        self.clone_gc_interval = float(os.getenv("VOICE_CLONE_GC_INTERVAL", 3600))
+        self._gc_task = None
+
+    async def start(self):
+        self._gc_task = asyncio.create_task(self._gc_loop())
+
+    async def stop(self):
+        if self._gc_task:
+            self._gc_task.cancel()
+            await asyncio.gather(self._gc_task, return_exceptions=True)
+            self._gc_task = None
 
     async def generate_voice(self, text: str, voice_id: str = "EXAVITQu4vr4xnSDxMaL") -> str:
         """
@@ -20,31 +69,11 @@ class VoiceService:
             # Extract key information from prompt to create narration
             narration_text = self._create_narration(text)
 
-            # Generate audio
-            audio_generator = await self.client.text_to_speech.convert(
-                voice_id=voice_id,
-                text=narration_text,
-                model_id="eleven_multilingual_v2",
-                voice_settings=VoiceSettings(
-                    stability=0.5,
-                    similarity_boost=0.75,
-                    style=0.5,
-                    use_speaker_boost=True
-                )
+            # Generate audio (served from the TTS cache when identical)
+            return await self._synthesize(
+                narration_text, voice_id, DEFAULT_VOICE_SETTINGS, prefix="voice"
             )
 
-            # Save audio file
-            audio_id = str(uuid.uuid4())
-            audio_path = self.output_dir / f"voice_{audio_id}.mp3"
-
-            # Write the audio stream to file
-            with open(audio_path, "wb") as f:
-                async for chunk in audio_generator:
-                    if chunk:
-                        f.write(chunk)
-
-            return str(audio_path)
-
         except Exception as e:
             raise Exception(f"Error generating voice: {str(e)}")
 
@@ -56,36 +85,119 @@ class VoiceService:
             # Create narration from prompt
             narration_text = self._create_narration(text)
 
-            # Upload voice sample and create voice clone
-            with open(voice_sample_path, "rb") as f:
-                voice_data = f.read()
+            # Reuse the clone registered for this sample, or create it once
+            voice_id = await self.get_or_create_clone(voice_sample_path)
 
-            # Add voice to library (voice cloning)
-            voice = await self.client.voices.add(
-                name=f"user_voice_{uuid.uuid4().hex[:8]}",
-                files=[voice_data]
+            # Generate audio with cloned voice
+            return await self._synthesize(narration_text, voice_id, None, prefix="voice_cloned")
+
+        except Exception as e:
+            raise Exception(f"Error cloning voice: {str(e)}")
+
+    async def _synthesize(
+        self,
+        narration_text: str,
+        voice_id: str,
+        voice_settings: Optional[dict],
+        prefix: str
+    ) -> str:
+        """
+        Text-to-speech through the disk cache
+        A hit never touches the network; concurrent identical misses share one request
+        """
+        key = self.tts_cache.key(narration_text, voice_id, TTS_MODEL_ID, voice_settings)
+
+        cached_path = await self.tts_cache.get(key)
+        if cached_path is None:
+            cached_path = await self.tts_single_flight.do(
+                key, lambda: self._convert(key, narration_text, voice_id, voice_settings)
             )
 
-            # Generate audio with cloned voice
-            audio_generator = await self.client.text_to_speech.convert(
-                voice_id=voice.voice_id,
+        # Give the job its own link so cache eviction can't remove the file
+        audio_id = str(uuid.uuid4())
+        audio_path = self.output_dir / f"{prefix}_{audio_id}.mp3"
+        await file_io.run(link_or_copy, cached_path, audio_path)
+
+        return str(audio_path)
+
+    async def _convert(
+        self,
+        key: str,
+        narration_text: str,
+        voice_id: str,
+        voice_settings: Optional[dict]
+    ) -> Path:
+        with metrics.stage("tts"):
+            audio_generator = await self.guard.call(
+                self.client.text_to_speech.convert,
+                voice_id=voice_id,
                 text=narration_text,
-                model_id="eleven_multilingual_v2"
+                model_id=TTS_MODEL_ID,
+                voice_settings=VoiceSettings(**voice_settings) if voice_settings else None
             )
 
-            # Save audio
-            audio_id = str(uuid.uuid4())
-            audio_path = self.output_dir / f"voice_cloned_{audio_id}.mp3"
+            # Write the audio stream into the cache
+            return await self.tts_cache.put_stream(key, audio_generator)
 
-            with open(audio_path, "wb") as f:
-                async for chunk in audio_generator:
-                    if chunk:
-                        f.write(chunk)
+    async def get_or_create_clone(self, voice_sample_path: str) -> str:
+        """
+        Return the ElevenLabs voice_id for a sample, cloning it only the first time
+        Concurrent requests for the same sample share a single clone call
+        """
+        sample_sha256 = await file_io.run(file_sha256, voice_sample_path)
+
+        voice_id = await self.clone_registry.get(sample_sha256)
+        if voice_id:
+            return voice_id
+
+        return await self.clone_single_flight.do(
+            sample_sha256, lambda: self._create_clone(sample_sha256, voice_sample_path)
+        )
+
+    async def _create_clone(self, sample_sha256: str, voice_sample_path: str) -> str:
+        # Another worker may have registered it while we were waiting
+        voice_id = await self.clone_registry.get(sample_sha256)
+        if voice_id:
+            return voice_id
+
+        # Upload voice sample and create voice clone
+        voice_data = await file_io.read_bytes(voice_sample_path)
+
+        # Add voice to library (voice cloning)
+        with metrics.stage("voice_clone"):
+            voice = await self.guard.call(
+                self.client.voices.add,
+                idempotent=False,
+                name=f"user_voice_{sample_sha256[:12]}",
+                files=[voice_data]
+            )
 
-            return str(audio_path)
+        await self.clone_registry.put(sample_sha256, voice.voice_id)
+        return voice.voice_id
 
-        except Exception as e:
-            raise Exception(f"Error cloning voice: {str(e)}")
+    async def collect_stale_clones(self) -> int:
+        """
+        Delete cloned voices that haven't been used within the TTL from ElevenLabs
+        """
+        removed = 0
+        for clone in await self.clone_registry.stale(self.clone_ttl):
+            try:
+                await self.guard.call(self.client.voices.delete, clone["voice_id"])
+            except Exception as e:
+                print(f"Warning: Failed to delete voice {clone['voice_id']}: {str(e)}")
+                continue
+            await self.clone_registry.remove(clone["sample_sha256"])
+            removed += 1
+        return removed
+
+    async def _gc_loop(self):
+        while True:
+            try:
+                if cluster.is_leader:
+                    await self.collect_stale_clones()
+            except Exception as e:
+                print(f"Warning: Voice clone cleanup failed: {str(e)}")
+            await asyncio.sleep(self.clone_gc_interval)
 
     def _create_narration(self, prompt: str) -> str:
         """
@@ -94,23 +206,15 @@ class VoiceService:
         """
         # For now, we'll use a simple extraction
         # In production, you might want to use GPT to create better narration
-
-        # Simple narration template
-        if "gym" in prompt.lower() or "workout" in prompt.lower():
-            narration = f"Hey everyone! Today I'm showing you an amazing workout. {prompt}. Let's get started and crush this training session!"
-        elif "exercise" in prompt.lower():
-            narration = f"What's up! Ready for today's exercise routine? {prompt}. Let's do this together!"
-        else:
-            narration = f"Hello! Check out what I've got for you today. {prompt}. Stay tuned and don't forget to like and subscribe!"
-
-        return narration
+        category = prompt_classifier.classify("narration", prompt)
+        return NARRATION_TEMPLATES[category].format(prompt=prompt)
 
     async def get_available_voices(self):
         """
         Get list of available AI voices from ElevenLabs
         """
         try:
-            voices = await self.client.voices.get_all()
+            voices = await self.guard.call(self.client.voices.get_all)
             return [{"id": v.voice_id, "name": v.name} for v in voices.voices]
         except Exception as e:
             raise Exception(f"Error getting voices: {str(e)}")
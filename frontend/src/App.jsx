@@ -103,8 +103,50 @@ function App() {
     }
   }
 
-  // Check video status
-  const checkVideoStatus = async (id) => {
+  // Follow video progress over server-sent events, falling back to polling
+  const checkVideoStatus = (id) => {
+    if (!window.EventSource) {
+      pollVideoStatus(id)
+      return
+    }
+
+    const source = new EventSource(`/api/video/events/${id}`)
+    let finished = false
+
+    const finish = () => {
+      finished = true
+      source.close()
+      setIsGenerating(false)
+    }
+
+    const handleEvent = (event) => {
+      const data = JSON.parse(event.data)
+      setVideoStatus(data)
+
+      // Stage events (music, voice) carry their own status; only the job-level
+      // status snapshot says whether the whole job has finished
+      const jobStatus = data.event === 'status' ? data.status : null
+      if (data.event === 'done' || jobStatus === 'completed') {
+        finish()
+        setStep(4)
+      } else if (data.event === 'failed' || jobStatus === 'failed') {
+        finish()
+        alert('Video generation failed: ' + (data.error || 'Unknown error'))
+      }
+    }
+
+    const eventNames = ['status', 'queued', 'music', 'voice', 'waiting_for_render', 'sora_submitted', 'rendering', 'downloading', 'done', 'failed']
+    eventNames.forEach((name) => source.addEventListener(name, handleEvent))
+
+    source.onerror = () => {
+      if (finished) return
+      source.close()
+      pollVideoStatus(id)
+    }
+  }
+
+  // Poll video status
+  const pollVideoStatus = (id) => {
     const interval = setInterval(async () => {
       try {
         const response = await axios.get(`/api/video/status/${id}`)
@@ -336,6 +378,12 @@ function App() {
                 <br />
                 This may take 1-2 minutes
               </p>
+              {videoStatus?.event === 'waiting_for_render' && (
+                <p className="text-gray-600 mb-8">
+                  Waiting for a render slot
+                  {videoStatus.queue_position ? ` (position ${videoStatus.queue_position} in queue)` : ''}
+                </p>
+              )}
               <div className="flex justify-center gap-8 text-sm">
                 <div className="flex items-center gap-2">
                   <Video className="w-5 h-5 text-green-500" />